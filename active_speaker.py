@@ -0,0 +1,281 @@
+import subprocess
+
+import cv2
+import numpy as np
+
+from center_yolo import detect_people_batch, analysis_frames, frame_thumbnail, is_scene_change
+from metrics import Metrics
+from config import (
+    DETECTION_STRIDE,
+    DETECTION_BATCH_SIZE,
+    DETECTION_IMGSZ,
+    SPEAKER_SWITCH_MARGIN,
+    SPEAKER_MIN_HOLD_SECONDS,
+    USE_FRAME_STORE,
+)
+
+
+def load_audio(input_video, sample_rate=16000):
+    """Mono PCM samples of the video's audio as floats, or None without audio"""
+    try:
+        proc = subprocess.run(
+            ['ffmpeg', '-hide_banner', '-loglevel', 'error',
+             '-i', input_video, '-vn', '-ac', '1', '-ar', str(sample_rate),
+             '-f', 's16le', '-'],
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        )
+    except OSError as e:
+        print(f"[WARN] Could not read audio of {input_video}: {e}")
+        return None
+    if proc.returncode != 0 or not proc.stdout:
+        return None
+    return np.frombuffer(proc.stdout, dtype=np.int16).astype(np.float32) / 32768.0
+
+
+def audio_energy(samples, times, window=0.5, sample_rate=16000):
+    """RMS of the audio in a window centered on each time (all times at once)"""
+    squares = np.concatenate(([0.0], np.cumsum(samples.astype(np.float64) ** 2)))
+    half = int(window * sample_rate / 2)
+    centers = (np.asarray(times) * sample_rate).astype(np.int64)
+    lo = np.clip(centers - half, 0, len(samples))
+    hi = np.clip(centers + half, 0, len(samples))
+    counts = np.maximum(hi - lo, 1)
+    return np.sqrt((squares[hi] - squares[lo]) / counts)
+
+
+def speech_activity(energy):
+    """Treat the quietest quarter of the clip as silence; speech is clearly above it"""
+    if energy is None or not len(energy):
+        return None
+    floor = np.percentile(energy, 25)
+    return energy > floor * 2 + 1e-4
+
+
+def iou(a, b):
+    """Intersection over union of two (center_x, center_y, w, h) boxes"""
+    ax1, ay1, ax2, ay2 = a[0] - a[2] / 2, a[1] - a[3] / 2, a[0] + a[2] / 2, a[1] + a[3] / 2
+    bx1, by1, bx2, by2 = b[0] - b[2] / 2, b[1] - b[3] / 2, b[0] + b[2] / 2, b[1] + b[3] / 2
+    iw = max(0.0, min(ax2, bx2) - max(ax1, bx1))
+    ih = max(0.0, min(ay2, by2) - max(ay1, by1))
+    inter = iw * ih
+    union = a[2] * a[3] + b[2] * b[3] - inter
+    return inter / union if union > 0 else 0.0
+
+
+def track_people(samples, iou_threshold=0.3, max_missing=5, resets=()):
+    """
+    Give the person boxes of consecutive samples stable IDs by greedily
+    matching them to the previous boxes with the highest IoU. At samples in
+    `resets` (first sample of a new shot) all tracks are dropped.
+    Returns one {track_id: index into that sample's boxes} dict per sample.
+    """
+    tracks = {}  # track_id -> (last bbox, samples since last seen)
+    next_id = 0
+    tracked = []
+    for s, boxes in enumerate(samples):
+        if s in resets:
+            tracks = {}
+        pairs = sorted(
+            ((iou(last, box), tid, j) for tid, (last, _) in tracks.items() for j, box in enumerate(boxes)),
+            reverse=True,
+        )
+        assigned = {}
+        used_tracks = set()
+        for score, tid, j in pairs:
+            if score < iou_threshold:
+                break
+            if tid in used_tracks or j in assigned:
+                continue
+            assigned[j] = tid
+            used_tracks.add(tid)
+        for j in range(len(boxes)):
+            if j not in assigned:
+                assigned[j] = next_id
+                next_id += 1
+
+        current = {tid: j for j, tid in assigned.items()}
+        for tid in list(tracks):
+            if tid not in current:
+                last, missing = tracks[tid]
+                if missing + 1 > max_missing:
+                    del tracks[tid]
+                else:
+                    tracks[tid] = (last, missing + 1)
+        for tid, j in current.items():
+            tracks[tid] = (boxes[j], 0)
+        tracked.append(current)
+    return tracked
+
+
+def mouth_motion(prev_gray, gray, bbox):
+    """
+    Mean frame difference in the lower part of the head region of a person
+    box (roughly where the mouth is) - high while that person talks.
+    """
+    center_x, center_y, w, h = bbox
+    top = center_y - h // 2
+    y1 = max(0, int(top + 0.10 * h))
+    y2 = max(y1 + 1, int(top + 0.30 * h))
+    x1 = max(0, int(center_x - 0.2 * w))
+    x2 = max(x1 + 1, int(center_x + 0.2 * w))
+    a = prev_gray[y1:y2, x1:x2]
+    b = gray[y1:y2, x1:x2]
+    if a.size == 0:
+        return np.nan
+    return float(cv2.absdiff(a, b).mean())
+
+
+def _smooth_scores(scores, window):
+    """Moving average over samples, per track, ignoring NaN (track absent)"""
+    if window <= 1:
+        return scores
+    kernel = np.ones(window)
+    valid = ~np.isnan(scores)
+    values = np.where(valid, scores, 0.0)
+    sums = np.apply_along_axis(lambda col: np.convolve(col, kernel, mode="same"), 0, values)
+    counts = np.apply_along_axis(lambda col: np.convolve(col, kernel, mode="same"), 0, valid.astype(float))
+    smoothed = sums / np.maximum(counts, 1)
+    smoothed[~valid] = np.nan
+    return smoothed
+
+
+def choose_speaker(scores, speech=None, margin=SPEAKER_SWITCH_MARGIN, min_hold=3, resets=()):
+    """
+    Pick the talking track (column) for every sample (row) with hysteresis:
+    the framing only moves to another person after they beat the current
+    one by `margin` for `min_hold` consecutive samples while there is
+    speech. The choice starts over at samples in `resets` (scene cuts).
+    Returns the column index per sample (-1 when nobody is visible).
+    """
+    n_samples = scores.shape[0]
+    choice = np.full(n_samples, -1, dtype=int)
+    current = -1
+    challenger = -1
+    streak = 0
+    for s in range(n_samples):
+        row = scores[s]
+        visible = ~np.isnan(row)
+        if s in resets:
+            current = -1
+        if not visible.any():
+            current = -1
+            continue
+        if current < 0 or not visible[current]:
+            current = int(np.nanargmax(row))
+            streak = 0
+        elif speech is None or speech[s]:
+            best = int(np.nanargmax(row))
+            if best != current and row[best] > row[current] * (1 + margin):
+                if best == challenger:
+                    streak += 1
+                else:
+                    challenger = best
+                    streak = 1
+                if streak >= min_hold:
+                    current = best
+                    streak = 0
+            else:
+                streak = 0
+        choice[s] = current
+    return choice
+
+
+def analyze_active_speaker(input_video, model, fps, stride=DETECTION_STRIDE,
+                           batch_size=DETECTION_BATCH_SIZE, metrics=None, imgsz=DETECTION_IMGSZ,
+                           use_frame_store=USE_FRAME_STORE):
+    """
+    Analysis pass for multi-person framing. Every `stride`-th frame is a
+    sample: all people are detected (in batches), tracked with stable IDs
+    and scored by mouth-region motion; audio energy gates switching. The
+    speaker is then chosen for all samples at once. Tracking and the
+    speaker choice start over at every scene cut. With use_frame_store the
+    frames are read from the clip's frame store (see analysis_frames).
+
+    Returns (per-frame center x with NaN where unknown, frame shape,
+    frame indices where the framing jumps: speaker switches and cuts).
+    """
+    if metrics is None:
+        metrics = Metrics()
+    stride = max(1, stride)
+    sample_frames = []
+    sample_boxes = []
+    sample_motion = []
+    pending = []  # (frame index, frame, previous gray frame) awaiting detection
+    frame_shape = None
+    n_frames = 0
+    prev_gray = None
+    prev_thumb = None
+    scene_cuts = []
+
+    def flush():
+        boxes_per_frame = detect_people_batch([p[1] for p in pending], model, imgsz)
+        for (index, frame, before), boxes in zip(pending, boxes_per_frame):
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            sample_frames.append(index)
+            sample_boxes.append(boxes)
+            sample_motion.append([
+                mouth_motion(before, gray, box) if before is not None else 0.0
+                for box in boxes
+            ])
+        pending.clear()
+
+    with metrics.stage("detection"):
+        frames, scale, source_shape = analysis_frames(input_video, use_frame_store)
+        for i, frame in enumerate(frames):
+            frame_shape = frame.shape
+            n_frames = i + 1
+            thumb = frame_thumbnail(frame)
+            if is_scene_change(prev_thumb, thumb):
+                scene_cuts.append(i)
+            prev_thumb = thumb
+            if i % stride == 0:
+                pending.append((i, frame, prev_gray))
+                if len(pending) >= batch_size:
+                    flush()
+            # Only the frame right before a sample is needed for motion
+            if (i + 1) % stride == 0:
+                prev_gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            else:
+                prev_gray = None
+        if pending:
+            flush()
+
+    if frame_shape is None:
+        return None, None, []
+    if source_shape is not None:
+        frame_shape = source_shape
+
+    with metrics.stage("speaker"):
+        # First sample of every new shot
+        resets = set(np.searchsorted(sample_frames, scene_cuts).tolist())
+        tracked = track_people(sample_boxes, resets=resets)
+        track_ids = sorted({tid for t in tracked for tid in t})
+        column = {tid: k for k, tid in enumerate(track_ids)}
+        scores = np.full((len(tracked), max(1, len(track_ids))), np.nan)
+        centers_by_track = np.full_like(scores, np.nan)
+        for s, (tracks, boxes, motion) in enumerate(zip(tracked, sample_boxes, sample_motion)):
+            for tid, j in tracks.items():
+                scores[s, column[tid]] = motion[j]
+                centers_by_track[s, column[tid]] = boxes[j][0] / scale
+
+        samples_per_second = fps / stride
+        scores = _smooth_scores(scores, max(1, int(round(samples_per_second / 2))))
+        samples = load_audio(input_video)
+        speech = None
+        if samples is not None:
+            speech = speech_activity(audio_energy(samples, np.array(sample_frames) / fps))
+        min_hold = max(1, int(round(SPEAKER_MIN_HOLD_SECONDS * samples_per_second)))
+        choice = choose_speaker(scores, speech, SPEAKER_SWITCH_MARGIN, min_hold, resets)
+
+        sample_centers = np.array([
+            centers_by_track[s, c] if c >= 0 else np.nan for s, c in enumerate(choice)
+        ])
+        # Each frame takes the center of the latest sample at or before it
+        idx = np.searchsorted(sample_frames, np.arange(n_frames), side="right") - 1
+        centers = sample_centers[np.clip(idx, 0, len(sample_centers) - 1)]
+        switches = [
+            sample_frames[s] for s in range(1, len(choice))
+            if choice[s] >= 0 and choice[s - 1] >= 0 and choice[s] != choice[s - 1]
+        ]
+    metrics.count("scene_cuts", len(scene_cuts))
+    return centers, frame_shape, sorted(set(switches) | set(scene_cuts))
@@ -0,0 +1,191 @@
+"""
+Throughput benchmark for the reel pipeline.
+
+Generates a synthetic test video with ffmpeg and a matching synthetic
+transcript, serves canned GPT answers from a local stub OpenAI server and
+runs the segmentation + rendering stages, then writes the per-stage
+metrics as JSON. With --baseline, exits non-zero if frames/s dropped by
+more than --tolerance compared to an earlier run.
+
+    python benchmark.py --duration 120 --vertical --out bench.json
+    python benchmark.py --duration 120 --vertical --baseline bench.json
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def make_synthetic_video(path, duration, width=1280, height=720, fps=30):
+    """Moving test pattern with a tone, encoded like a typical download"""
+    subprocess.run([
+        "ffmpeg", "-y", "-hide_banner", "-loglevel", "error",
+        "-f", "lavfi", "-i", f"testsrc2=size={width}x{height}:rate={fps}",
+        "-f", "lavfi", "-i", "sine=frequency=440:sample_rate=44100",
+        "-t", str(duration),
+        "-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p",
+        "-c:a", "aac",
+        path,
+    ], check=True)
+    return path
+
+
+def make_synthetic_transcript(duration, line_seconds=3.0):
+    """Transcript lines in the youtube_transcript_api shape"""
+    lines = []
+    t = 0.0
+    n = 0
+    while t < duration:
+        lines.append({
+            "text": f"this is synthetic line number {n} of the benchmark podcast",
+            "start": round(t, 2),
+            "duration": line_seconds,
+        })
+        t += line_seconds
+        n += 1
+    return lines
+
+
+def stub_segments(prompt, segment_seconds=30.0):
+    """Group the [start=...] lines of a prompt into fixed-length segments"""
+    starts = [float(m) for m in re.findall(r"\[start=([0-9.]+)\]", prompt)]
+    segments = []
+    seg_start = None
+    for start in starts:
+        if seg_start is None:
+            seg_start = start
+        elif start - seg_start >= segment_seconds:
+            segments.append({"topic": f"Topic at {seg_start:.0f}s", "start": seg_start, "end": start})
+            seg_start = start
+    if seg_start is not None and starts and starts[-1] > seg_start:
+        segments.append({"topic": f"Topic at {seg_start:.0f}s", "start": seg_start, "end": starts[-1]})
+    return segments
+
+
+class StubOpenAIHandler(BaseHTTPRequestHandler):
+    """Answers /v1/chat/completions like the OpenAI API, without a model"""
+
+    def do_POST(self):
+        if not self.path.endswith("/chat/completions"):
+            self.send_error(404)
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        prompt = request.get("messages", [{}])[-1].get("content", "")
+        body = json.dumps({
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "created": 0,
+            "model": request.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": json.dumps(stub_segments(prompt))},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        }).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_openai_server():
+    """Start the stub server on a free local port; returns (server, base_url)"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubOpenAIHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+
+def run_benchmark(duration, vertical, workdir, download_mode="full", encode_profile="publish"):
+    server, base_url = start_stub_openai_server()
+    # config reads these at import time, so set them before importing the pipeline
+    os.environ["OPENAI_BASE_URL"] = base_url
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+    try:
+        from main import run_pipeline
+        from metrics import Metrics
+
+        metrics = Metrics()
+        video_file = os.path.join(workdir, "synthetic.mp4")
+        with metrics.stage("generate_input"):
+            make_synthetic_video(video_file, duration)
+        transcript_data = make_synthetic_transcript(duration)
+
+        results = run_pipeline(
+            video_file, transcript_data,
+            output_folder=os.path.join(workdir, "segments"),
+            vertical=vertical, metrics=metrics, download_mode=download_mode,
+            encode_profile=encode_profile,
+        )
+        report = metrics.to_dict()
+        report["input_seconds"] = duration
+        report["vertical"] = vertical
+        report["download_mode"] = download_mode
+        report["encode_profile"] = encode_profile
+        report["segments_ok"] = sum(1 for r in results or [] if r["status"] == "ok")
+        return report
+    finally:
+        server.shutdown()
+
+
+def find_regressions(current, baseline, tolerance):
+    """Messages for every throughput figure that got worse than tolerance allows"""
+    regressions = []
+    old_fps = baseline.get("frames_per_s")
+    new_fps = current.get("frames_per_s")
+    if old_fps and new_fps is not None and new_fps < old_fps * (1 - tolerance):
+        regressions.append(f"frames_per_s dropped from {old_fps} to {new_fps}")
+    for stage, old in baseline.get("stages", {}).items():
+        new = current.get("stages", {}).get(stage)
+        if new is not None and old > 0.5 and new > old * (1 + tolerance):
+            regressions.append(f"stage '{stage}' slowed from {old:.2f}s to {new:.2f}s")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the reel pipeline on synthetic input.")
+    parser.add_argument("--duration", type=float, default=90.0, help="Synthetic video length in seconds")
+    parser.add_argument("--vertical", action="store_true", help="Also render the vertical reels")
+    parser.add_argument("--download-mode", choices=("full", "sections"), default="full",
+                        help="'sections' cuts the segments' ranges out of the synthetic video first, "
+                             "standing in for a ranged yt-dlp download")
+    parser.add_argument("--profile", choices=("draft", "preview", "publish"), default="publish",
+                        help="Encode profile (see ffmpeg_utils.ENCODE_PROFILES)")
+    parser.add_argument("--out", default="benchmark.json", help="Where to write the JSON report")
+    parser.add_argument("--baseline", help="Earlier report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed relative slowdown")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        report = run_benchmark(args.duration, args.vertical, workdir, args.download_mode, args.profile)
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+
+    if baseline is not None:
+        regressions = find_regressions(report, baseline, args.tolerance)
+        for message in regressions:
+            print(f"[REGRESSION] {message}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
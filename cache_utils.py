@@ -0,0 +1,172 @@
+import hashlib
+import json
+import os
+import shutil
+
+from config import CACHE_DIR, CACHE_MAX_BYTES
+
+# Pipeline stages that can be cached (and invalidated) independently;
+# "frames" holds the memory-mapped analysis frames of frame_store.py
+STAGES = ("download", "transcript", "segments", "frames")
+# Stages sharing max_bytes; frame stores are evicted against their own budget
+SHARED_STAGES = ("download", "transcript", "segments")
+
+
+def make_key(*parts):
+    """Content address for a cache entry built from its inputs"""
+    digest = hashlib.sha256()
+    for part in parts:
+        if not isinstance(part, (str, bytes)):
+            part = json.dumps(part, sort_keys=True)
+        if isinstance(part, str):
+            part = part.encode("utf-8")
+        digest.update(part)
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _entry_path(path):
+    """A cache file's path without its extensions: what the files of one entry share"""
+    folder, name = os.path.split(path)
+    return os.path.join(folder, name.split(".", 1)[0])
+
+
+class Cache:
+    """
+    On-disk cache with one directory per stage. Entries are files named by
+    their content key; reading an entry refreshes its mtime, and the least
+    recently used entries are evicted once the cache exceeds max_bytes.
+    """
+
+    def __init__(self, root=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+
+    def path(self, stage, key, ext=".json"):
+        if stage not in STAGES:
+            raise ValueError(f"Unknown cache stage: {stage}")
+        folder = os.path.join(self.root, stage)
+        os.makedirs(folder, exist_ok=True)
+        return os.path.join(folder, key + ext)
+
+    def _touch(self, path):
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+
+    def get_file(self, stage, key, ext):
+        """Path of a cached file, or None on a miss"""
+        path = self.path(stage, key, ext)
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            self._touch(path)
+            return path
+        return None
+
+    def put_file(self, stage, key, ext, src_path):
+        """Move src_path into the cache and return its new location"""
+        path = self.path(stage, key, ext)
+        shutil.move(src_path, path)
+        self._touch(path)  # Downloads may carry an old mtime
+        self.evict(keep=path)
+        return path
+
+    def get_json(self, stage, key):
+        path = self.get_file(stage, key, ".json")
+        if path is None:
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"[WARN] Ignoring unreadable cache entry {path}: {e}")
+            return None
+
+    def put_json(self, stage, key, value):
+        path = self.path(stage, key, ".json")
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(value, f)
+        os.replace(tmp_path, path)
+        self.evict(keep=path)
+        return path
+
+    def invalidate(self, stage=None):
+        """Drop every entry of a stage (or of all stages)"""
+        stages = STAGES if stage is None else (stage,)
+        for name in stages:
+            if name not in STAGES:
+                raise ValueError(f"Unknown cache stage: {name}")
+            shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+
+    def evict(self, keep=None, stages=SHARED_STAGES, max_bytes=None):
+        """
+        Remove least recently used entries of `stages` until they fit
+        max_bytes (default self.max_bytes). An entry is every file sharing a
+        key (e.g. a frame store's .frames and .json), removed together; the
+        entry of the file `keep` and unfinished .tmp files are never removed.
+        """
+        if max_bytes is None:
+            max_bytes = self.max_bytes
+        if not max_bytes:
+            return
+        entries = {}
+        total = 0
+        for stage in stages:
+            folder = os.path.join(self.root, stage)
+            if not os.path.isdir(folder):
+                continue
+            for name in os.listdir(folder):
+                if name.endswith(".tmp"):
+                    continue
+                path = os.path.join(folder, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entry = entries.setdefault(_entry_path(path), [0.0, 0, []])
+                entry[0] = max(entry[0], st.st_mtime)
+                entry[1] += st.st_size
+                entry[2].append(path)
+                total += st.st_size
+        if total <= max_bytes:
+            return
+        kept = _entry_path(keep) if keep else None
+        for key_path, (_, size, paths) in sorted(entries.items(), key=lambda item: item[1][0]):
+            if total <= max_bytes:
+                break
+            if key_path == kept:
+                continue
+            for path in paths:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            total -= size
+            print(f"[INFO] Evicted cache entry {key_path}")
+
+
+def cached_download(cache, video_id, url, download):
+    """Return a cached copy of the video, calling download(url, path) on a miss"""
+    key = make_key("download", video_id)
+    path = cache.get_file("download", key, ".mp4")
+    if path:
+        print(f"[CACHE] Using cached download for {video_id}.")
+        return path
+    tmp_path = cache.path("download", key, ".part.mp4")
+    video_file = download(url, tmp_path)
+    if not video_file:
+        return None
+    return cache.put_file("download", key, ".mp4", video_file)
+
+
+def cached_json(cache, stage, key, compute):
+    """Return the cached JSON value for key, calling compute() on a miss"""
+    value = cache.get_json(stage, key)
+    if value is not None:
+        print(f"[CACHE] Using cached {stage}.")
+        return value
+    value = compute()
+    if value is not None:
+        cache.put_json(stage, key, value)
+    return value
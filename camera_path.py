@@ -0,0 +1,103 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def fill_missing(centers):
+    """
+    Replace NaN entries (frames without a detection) by linear interpolation
+    between the nearest detections; leading/trailing gaps hold the nearest
+    value. Returns None when nothing was detected at all.
+    """
+    centers = np.asarray(centers, dtype=float)
+    known = ~np.isnan(centers)
+    if not known.any():
+        return None
+    idx = np.arange(len(centers))
+    return np.interp(idx, idx[known], centers[known])
+
+
+def _median_filter(x, window):
+    """Running median (odd window, edges padded) - removes detection outliers"""
+    if window <= 1 or len(x) < 3:
+        return x
+    half = window // 2
+    padded = np.pad(x, half, mode="edge")
+    return np.median(sliding_window_view(padded, 2 * half + 1), axis=1)
+
+
+def _moving_average(x, window):
+    """Running mean (odd window, edges padded) - removes high-frequency jitter"""
+    if window <= 1 or len(x) < 3:
+        return x
+    half = window // 2
+    padded = np.pad(x, half, mode="edge")
+    kernel = np.full(2 * half + 1, 1.0 / (2 * half + 1))
+    return np.convolve(padded, kernel, mode="valid")
+
+
+def _follow(x, max_step):
+    """
+    Path starting at x[0] that moves toward x by at most max_step per frame:
+    y[i] = clip(x[i], y[i-1] - max_step, y[i-1] + max_step).
+
+    Solved as a fixed point with whole-array updates instead of a loop over
+    frames: each sweep applies the recurrence to every frame at once, from
+    the previous sweep's path. Frames stop changing once the path before
+    them is final, so the number of sweeps is bounded by the longest stretch
+    where the limit is active (a pan), not by the clip length.
+    """
+    y = x.copy()
+    while True:
+        prev = y[:-1]
+        updated = np.concatenate((y[:1], np.clip(x[1:], prev - max_step, prev + max_step)))
+        if np.array_equal(updated, y):
+            return y
+        y = updated
+
+
+def _limit_velocity(x, max_step):
+    """
+    Clamp the per-frame movement to max_step. A forward and a backward pass
+    are averaged so the path anticipates moves instead of lagging behind
+    them; the average of two step-limited paths is still step-limited.
+    """
+    if len(x) < 2:
+        return x
+    forward = _follow(x, max_step)
+    backward = _follow(x[::-1], max_step)[::-1]
+    return (forward + backward) / 2
+
+
+def smooth_path(centers, window, max_step):
+    """Median, then mean filtering over `window` frames, then a velocity limit"""
+    path = _median_filter(centers, window)
+    path = _moving_average(path, window)
+    return _limit_velocity(path, max_step)
+
+
+def plan_camera_path(centers, frame_width, crop_width, fps, smoothing_seconds=1.0, max_speed=0.3,
+                     breaks=()):
+    """
+    Turn per-frame person centers (x, NaN where nothing was detected) into
+    the left edge of the vertical crop for every frame.
+
+    smoothing_seconds sets the filter window and max_speed caps how fast the
+    crop may pan, in frame widths per second. `breaks` are frame indices
+    where the camera may jump (e.g. switching to another speaker): each
+    piece between breaks is planned on its own.
+    """
+    centers = np.asarray(centers, dtype=float)
+    window = max(1, int(round(smoothing_seconds * fps))) | 1  # Odd window
+    max_step = max_speed * frame_width / fps
+
+    bounds = sorted({int(b) for b in breaks if 0 < b < len(centers)})
+    pieces = []
+    for piece in np.split(centers, bounds):
+        filled = fill_missing(piece)
+        if filled is None:
+            filled = np.full(len(piece), frame_width / 2.0)
+        pieces.append(smooth_path(filled, window, max_step))
+    path = np.concatenate(pieces) if pieces else centers
+
+    lefts = np.rint(path - crop_width / 2.0)
+    return np.clip(lefts, 0, max(0, frame_width - crop_width)).astype(int)
@@ -1,8 +1,36 @@
+import bisect
 import cv2
 import subprocess
+import queue
+import threading
 import numpy as np
-from ultralytics import YOLO
 import os
+import time
+
+from ffmpeg_utils import FFmpegFrameWriter, build_crop_render_command, get_encode_profile, reel_size
+from metrics import Metrics, timed_iter
+from camera_path import plan_camera_path
+from frame_store import frame_store_for
+from model_pool import DEFAULT_WEIGHTS, get_yolo_model
+from config import (
+    FRAME_QUEUE_SIZE,
+    DETECTION_STRIDE,
+    DETECTION_BATCH_SIZE,
+    DETECTION_IMGSZ,
+    DETECTION_ROI,
+    ROI_MARGIN,
+    SCENE_CHANGE_THRESHOLD,
+    SCENE_HIST_THRESHOLD,
+    STATIC_SHOT_THRESHOLD,
+    CAMERA_MODE,
+    CAMERA_SMOOTHING_SECONDS,
+    CAMERA_MAX_SPEED,
+    USE_FRAME_STORE,
+    REEL_RENDER,
+)
+
+# Sentinel marking the end of a frame queue
+_END = object()
 
 def get_first_frame(input_video):
     cap = cv2.VideoCapture(input_video)
@@ -24,179 +52,801 @@ def get_all_frames(input_video):
     cap.release()
     return frames
 
+def iter_frames(input_video):
+    """Yield frames one at a time so a clip never has to fit in memory"""
+    cap = cv2.VideoCapture(input_video)
+    if not cap.isOpened():
+        print(f"Error: Could not open video file {input_video}")
+        return
+    try:
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            yield frame
+    finally:
+        cap.release()
+
+def analysis_frames(input_video, use_frame_store=False):
+    """
+    Frames for an analysis pass: (frames, scale, source frame shape).
+    With use_frame_store they come zero-copy from the clip's memory-mapped
+    frame store (built on first use, see frame_store.py), downscaled by
+    `scale`; otherwise they are decoded at full size and the shape is None.
+    """
+    if use_frame_store:
+        store = frame_store_for(input_video)
+        if store is not None:
+            return store, store.scale, store.source_shape
+    return prefetch(iter_frames(input_video)), 1.0, None
+
+def get_video_properties(input_video):
+    """Return (fps, frame_count) for the video, falling back to 30 fps"""
+    cap = cv2.VideoCapture(input_video)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    return fps, frame_count
+
+def prefetch(iterable, maxsize=FRAME_QUEUE_SIZE):
+    """
+    Run an iterator on a background thread and yield its items through a
+    bounded queue, so decoding overlaps with the consumer without ever
+    buffering more than `maxsize` items.
+    """
+    items = queue.Queue(maxsize=maxsize)
+    errors = []
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put(item):
+                    return
+        except Exception as e:
+            errors.append(e)
+        put(_END)
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = items.get()
+            if item is _END:
+                if errors:
+                    raise errors[0]
+                break
+            yield item
+    finally:
+        stop.set()
+        thread.join()
+
+class QueuedFrameWriter:
+    """
+    Wrap a writer exposing write()/release() (e.g. cv2.VideoWriter) so frames
+    are encoded on a background thread fed by a bounded queue.
+    """
+
+    def __init__(self, writer, maxsize=FRAME_QUEUE_SIZE):
+        self.writer = writer
+        self.error = None
+        self.busy_seconds = 0.0  # Time spent inside writer.write()
+        self.frames = queue.Queue(maxsize=maxsize)
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            frame = self.frames.get()
+            if frame is _END:
+                break
+            if self.error is not None:
+                continue
+            start = time.perf_counter()
+            try:
+                self.writer.write(frame)
+            except Exception as e:
+                self.error = e
+            self.busy_seconds += time.perf_counter() - start
+
+    def write(self, frame):
+        if self.error is not None:
+            raise self.error
+        self.frames.put(frame)
+
+    def release(self):
+        self.frames.put(_END)
+        self.thread.join()
+        self.writer.release()
+        if self.error is not None:
+            raise self.error
+
+def _people_bboxes(result, scale=1.0, offset=(0, 0), first_only=False):
+    """
+    Return the person boxes of a YOLO result as (center_x, center_y, w, h).
+    Coordinates of a downscaled/cropped input are mapped back to the frame
+    with `scale` and `offset`.
+    """
+    bboxes = []
+    for box in result.boxes:
+        cls = int(box.cls[0])
+        if cls == 0:  # 0 is typically the class ID for person in COCO dataset
+            x1, y1, x2, y2 = (v / scale for v in box.xyxy[0].tolist())
+            ox, oy = offset
+            bboxes.append((int((x1 + x2) / 2) + ox, int((y1 + y2) / 2) + oy, int(x2 - x1), int(y2 - y1)))
+            if first_only:
+                break
+    return bboxes
+
+def _person_bbox(result, scale=1.0, offset=(0, 0)):
+    """Return the first person box of a YOLO result, or None"""
+    bboxes = _people_bboxes(result, scale, offset, first_only=True)
+    return bboxes[0] if bboxes else None
+
 def detect_person(frame, model):
     results = model(frame)
     for r in results:
-        boxes = r.boxes
-        for box in boxes:
-            cls = int(box.cls[0])
-            if cls == 0:  # 0 is typically the class ID for person in COCO dataset
-                x1, y1, x2, y2 = box.xyxy[0].tolist()
-                return (int((x1 + x2) / 2), int((y1 + y2) / 2), int(x2 - x1), int(y2 - y1))
+        bbox = _person_bbox(r)
+        if bbox is not None:
+            return bbox
     return None
 
+def roi_around(bbox, frame_shape, margin=ROI_MARGIN):
+    """Region (x1, y1, x2, y2) around a bbox, grown by `margin`, clamped to the frame"""
+    frame_height, frame_width = frame_shape[:2]
+    center_x, center_y, w, h = bbox
+    half_w = int(w * margin / 2)
+    half_h = int(h * margin / 2)
+    x1 = max(0, center_x - half_w)
+    y1 = max(0, center_y - half_h)
+    x2 = min(frame_width, center_x + half_w)
+    y2 = min(frame_height, center_y + half_h)
+    if x2 - x1 < 32 or y2 - y1 < 32:
+        return None
+    return x1, y1, x2, y2
+
+def _detect_regions(frames, rois, model, imgsz, all_people=False):
+    """
+    Run YOLO once over a batch, each frame cropped to its roi (or whole when
+    None) and shrunk so its long side is at most imgsz. Returns the first
+    person box per frame, or every person box with `all_people`.
+    """
+    inputs = []
+    transforms = []
+    for frame, roi in zip(frames, rois):
+        if roi is not None:
+            x1, y1, x2, y2 = roi
+            region = frame[y1:y2, x1:x2]
+            offset = (x1, y1)
+        else:
+            region = frame
+            offset = (0, 0)
+        height, width = region.shape[:2]
+        scale = min(1.0, imgsz / max(height, width))
+        if scale < 1.0:
+            region = cv2.resize(region, (max(1, round(width * scale)), max(1, round(height * scale))),
+                                interpolation=cv2.INTER_AREA)
+        inputs.append(region)
+        transforms.append((scale, offset))
+    results = model(inputs, imgsz=imgsz, verbose=False)
+    if all_people:
+        return [_people_bboxes(r, scale, offset) for r, (scale, offset) in zip(results, transforms)]
+    return [_person_bbox(r, scale, offset) for r, (scale, offset) in zip(results, transforms)]
+
+def detect_people_batch(frames, model, imgsz=DETECTION_IMGSZ):
+    """Every person box in each frame of a batch (one list per frame)"""
+    frames = list(frames)
+    if not frames:
+        return []
+    return _detect_regions(frames, [None] * len(frames), model, imgsz, all_people=True)
+
+def _touches_roi_edge(bbox, roi, frame_shape, tolerance=2):
+    """Whether a box found in roi is cut off by one of its sides (frame borders don't count)"""
+    frame_height, frame_width = frame_shape[:2]
+    x1, y1, x2, y2 = roi
+    center_x, center_y, w, h = bbox
+    return ((x1 > 0 and center_x - w / 2 <= x1 + tolerance)
+            or (y1 > 0 and center_y - h / 2 <= y1 + tolerance)
+            or (x2 < frame_width and center_x + w / 2 >= x2 - tolerance)
+            or (y2 < frame_height and center_y + h / 2 >= y2 - tolerance))
+
+def detect_person_batch(frames, model, imgsz=DETECTION_IMGSZ, prior_bbox=None, margins=None):
+    """
+    Run YOLO once over a list of frames and return one bbox (or None) per frame.
+
+    Frames are downscaled to the model input size before inference. With a
+    `prior_bbox` (the speaker's last known position) only the region around
+    it is searched first, grown by the frame's entry in `margins` (default
+    ROI_MARGIN); frames where that misses, or finds a box cut off by the
+    region's edge, are retried on the full frame.
+    """
+    frames = list(frames)
+    if not frames:
+        return []
+    if margins is None:
+        margins = [ROI_MARGIN] * len(frames)
+    rois = [roi_around(prior_bbox, f.shape, margin) if prior_bbox is not None else None
+            for f, margin in zip(frames, margins)]
+    bboxes = _detect_regions(frames, rois, model, imgsz)
+    misses = [i for i, bbox in enumerate(bboxes) if rois[i] is not None and (
+        bbox is None or _touches_roi_edge(bbox, rois[i], frames[i].shape))]
+    if misses:
+        retry = _detect_regions([frames[i] for i in misses], [None] * len(misses), model, imgsz)
+        for i, bbox in zip(misses, retry):
+            bboxes[i] = bbox
+    return bboxes
+
+def frame_thumbnail(frame, size=(64, 36)):
+    """Small grayscale copy of a frame, cheap enough to compare every frame"""
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    return cv2.resize(gray, size, interpolation=cv2.INTER_AREA)
+
+def _thumbnail_hist(thumb):
+    hist = cv2.calcHist([thumb], [0], None, [32], [0, 256])
+    return cv2.normalize(hist, hist).flatten()
+
+def is_scene_change(prev_thumb, thumb, threshold=SCENE_CHANGE_THRESHOLD,
+                    hist_threshold=SCENE_HIST_THRESHOLD):
+    """
+    A cut is a large mean absolute difference between two thumbnails that
+    also changes the brightness histogram (fast motion within one shot moves
+    pixels around but keeps the histogram).
+    """
+    if prev_thumb is None:
+        return False
+    if float(cv2.absdiff(prev_thumb, thumb).mean()) <= threshold:
+        return False
+    distance = cv2.compareHist(_thumbnail_hist(prev_thumb), _thumbnail_hist(thumb),
+                               cv2.HISTCMP_BHATTACHARYYA)
+    return distance > hist_threshold
+
+def is_static(ref_thumb, thumb, threshold=STATIC_SHOT_THRESHOLD):
+    """True when a frame is practically identical to the reference frame"""
+    if ref_thumb is None:
+        return False
+    return float(cv2.absdiff(ref_thumb, thumb).mean()) < threshold
+
+def interpolate_bbox(a, b, t):
+    """Linear interpolation between two (center_x, center_y, w, h) boxes"""
+    return tuple(int(round(pa + (pb - pa) * t)) for pa, pb in zip(a, b))
+
+def _emit_detections(buffer, keys, prev_key, model, final, imgsz, use_roi, stride):
+    """
+    Detect people on the buffered keyframes in one batch and yield
+    (frame, bbox) for the buffered frames, interpolating between keyframes.
+    With use_roi, each keyframe's search region around the previous batch's
+    last box grows with the number of strides since that box, so late
+    keyframes of a batch aren't searched around a stale position.
+    Static keyframes (unchanged since the last detected one) reuse the
+    previous box instead of running YOLO.
+    Frames after the last keyframe are kept in `buffer` (they need the next
+    keyframe) unless `final` is set. Returns the new previous keyframe.
+    """
+    base = buffer[0][0]
+    prior = prev_key[1] if use_roi and prev_key is not None else None
+    to_detect = [k for k, _, static in keys if not static]
+    margins = [ROI_MARGIN * max(1.0, (k - prev_key[0]) / stride) for k in to_detect] if prior else None
+    detected = dict(zip(to_detect, detect_person_batch(
+        [buffer[k - base][1] for k in to_detect], model, imgsz, prior, margins)))
+
+    anchors = [prev_key] if prev_key is not None else []
+    for k, cut, static in keys:
+        if static:
+            bbox = anchors[-1][1] if anchors else None
+        else:
+            bbox = detected[k]
+        anchors.append((k, bbox, cut))
+    anchor_idx = [a[0] for a in anchors]
+
+    emit_until = len(buffer) if final else keys[-1][0] - base + 1
+    for idx, frame in buffer[:emit_until]:
+        pos = bisect.bisect_right(anchor_idx, idx) - 1
+        prev_anchor = anchors[pos] if pos >= 0 else None
+        next_anchor = anchors[pos + 1] if pos + 1 < len(anchors) else None
+        # Never blend across a scene cut
+        if next_anchor is not None and next_anchor[2]:
+            next_anchor = None
+
+        a = prev_anchor[1] if prev_anchor is not None else None
+        b = next_anchor[1] if next_anchor is not None else None
+        if a is not None and b is not None:
+            t = (idx - prev_anchor[0]) / (next_anchor[0] - prev_anchor[0])
+            yield frame, interpolate_bbox(a, b, t)
+        else:
+            yield frame, a if a is not None else b
+
+    del buffer[:emit_until]
+    keys.clear()
+    return anchors[-1]
+
+def iter_detections(frames, model, stride=DETECTION_STRIDE, batch_size=DETECTION_BATCH_SIZE,
+                    imgsz=DETECTION_IMGSZ, use_roi=DETECTION_ROI, scene_cuts=None):
+    """
+    Yield (frame, bbox) for every frame while only running YOLO on every
+    `stride`-th frame (and on scene changes), `batch_size` keyframes at a time.
+    Boxes for the frames in between are linearly interpolated, never across
+    a scene cut. Keyframes of a static shot that look identical to the last
+    detected one reuse its box. Keyframes are downscaled to `imgsz` and,
+    with `use_roi`, searched around the last detection first.
+
+    Indices of scene cuts are appended to the `scene_cuts` list when given;
+    they are known before the frame itself is yielded.
+
+    At most about stride * batch_size frames are buffered at once.
+    """
+    stride = max(1, stride)
+    batch_size = max(1, batch_size)
+    buffer = []      # (index, frame) not yet emitted
+    keys = []        # (index, is_scene_cut, is_static) keyframes waiting for detection
+    prev_key = None  # (index, bbox, is_scene_cut) of the last emitted keyframe
+    last_key = -stride
+    prev_thumb = None
+    ref_thumb = None  # Thumbnail of the last keyframe sent to YOLO
+
+    for i, frame in enumerate(frames):
+        buffer.append((i, frame))
+        thumb = frame_thumbnail(frame)
+        cut = is_scene_change(prev_thumb, thumb)
+        prev_thumb = thumb
+        if cut and scene_cuts is not None:
+            scene_cuts.append(i)
+        if cut or i - last_key >= stride:
+            static = not cut and is_static(ref_thumb, thumb)
+            if not static:
+                ref_thumb = thumb
+            keys.append((i, cut, static))
+            last_key = i
+            if len(keys) >= batch_size:
+                prev_key = yield from _emit_detections(
+                    buffer, keys, prev_key, model, False, imgsz, use_roi, stride)
+
+    if buffer:
+        if keys:
+            yield from _emit_detections(buffer, keys, prev_key, model, True, imgsz, use_roi, stride)
+        else:
+            bbox = prev_key[1] if prev_key is not None else None
+            for _, frame in buffer:
+                yield frame, bbox
+
 def euclidean_distance(p1, p2):
     """Calculate Euclidean distance between two points"""
     return np.sqrt((p1[0] - p2[0])**2 + (p1[1] - p2[1])**2)
 
-def create_reel_frame(frame, person_bbox):
-    """Create a single frame for the reel with the given bbox"""
-    center_x, center_y, w, h = person_bbox
-    frame_height, frame_width = frame.shape[:2]
-    
-    target_width = 1080
-    target_height = 1920
-    
+def crop_width_for(frame_shape, target_width=1080, target_height=1920):
+    """Width of the full-height crop with the target aspect ratio"""
+    frame_height, frame_width = frame_shape[:2]
+    return min(frame_width, int(target_width * frame_height / target_height))
+
+def crop_window(frame_shape, center_x, target_width=1080, target_height=1920):
+    """Return the (left, right) columns of the vertical crop centered on center_x"""
+    frame_height, frame_width = frame_shape[:2]
+
     # Calculate the crop region
-    crop_width = min(frame_width, int(target_width * frame_height / target_height))
-    crop_height = frame_height
-    
+    crop_width = crop_width_for(frame_shape, target_width, target_height)
+
     left = max(0, center_x - crop_width // 2)
     right = min(frame_width, left + crop_width)
-    
+
     # Adjust if the crop goes out of bounds
     if left == 0:
         right = crop_width
     elif right == frame_width:
         left = frame_width - crop_width
-    
+    return left, right
+
+def create_reel_frame(frame, person_bbox, target_width=1080, target_height=1920):
+    """Create a single frame for the reel with the given bbox"""
+    center_x, center_y, w, h = person_bbox
+
+    left, right = crop_window(frame.shape, center_x, target_width, target_height)
     cropped = frame[:, left:right]
     
     # Resize to target dimensions
     return cv2.resize(cropped, (target_width, target_height))
 
-def process_video_with_stabilization(input_video, output_video, filter_sub=None, movement_threshold=150):
-    """Process video with stabilization to reduce jitter"""
-    
-    frames = get_all_frames(input_video)
-    if not frames:
-        print("No frames found in the video")
-        return
-    
-    # Get video properties
-    frame_height, frame_width = frames[0].shape[:2]
-    fps = 30
-    
-    # Create temporary video for processed frames
-    temp_video = output_video.replace('.mp4', '_temp.mp4')
-    
-    # Create video writer
-    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-    out = cv2.VideoWriter(temp_video, fourcc, fps, (1080, 1920))
-    
-    # Initialize variables for stabilization
-    last_stable_bbox = None
-    processed_frames = []
-    
-    print(f"Processing {len(frames)} frames...")
-    
-    # First pass: Detect person in each frame and apply stabilization
-    model = YOLO('yolov8n.pt')
-    for i, frame in enumerate(frames):
-        current_bbox = detect_person(frame, model)
-        
-        if current_bbox is None:
-            # If no person detected, use last stable bbox if available
-            if last_stable_bbox is not None:
-                current_bbox = last_stable_bbox
-            else:
-                # If no previous bbox, use center of frame
-                center_x = frame_width // 2
-                center_y = frame_height // 2
-                current_bbox = (center_x, center_y, frame_width // 3, frame_height // 2)
-        
-        if last_stable_bbox is None:
-            # First detection becomes the stable bbox
-            last_stable_bbox = current_bbox
+def stabilize_bbox(current_bbox, last_stable_bbox, frame_shape, movement_threshold):
+    """
+    Apply the movement threshold to a detection.
+    Returns (bbox to render, new last stable bbox).
+    """
+    if current_bbox is None:
+        # If no person detected, use last stable bbox if available
+        if last_stable_bbox is not None:
+            current_bbox = last_stable_bbox
         else:
-            # Check if movement exceeds threshold
-            current_center = (current_bbox[0], current_bbox[1])
-            last_center = (last_stable_bbox[0], last_stable_bbox[1])
-
-            print(euclidean_distance(current_center, last_center), movement_threshold)
-            
-            if euclidean_distance(current_center, last_center) < movement_threshold:
-                # Movement is small, use the last stable bbox
-                current_bbox = last_stable_bbox
-            else:
-                # Movement is significant, update the stable bbox
-                last_stable_bbox = current_bbox
-        
+            # If no previous bbox, use center of frame
+            frame_height, frame_width = frame_shape[:2]
+            center_x = frame_width // 2
+            center_y = frame_height // 2
+            current_bbox = (center_x, center_y, frame_width // 3, frame_height // 2)
+
+    if last_stable_bbox is None:
+        # First detection becomes the stable bbox
+        return current_bbox, current_bbox
+
+    # Check if movement exceeds threshold
+    current_center = (current_bbox[0], current_bbox[1])
+    last_center = (last_stable_bbox[0], last_stable_bbox[1])
+
+    if euclidean_distance(current_center, last_center) < movement_threshold:
+        # Movement is small, use the last stable bbox
+        return last_stable_bbox, last_stable_bbox
+    # Movement is significant, update the stable bbox
+    return current_bbox, current_bbox
+
+def _crop_lefts(frames, scale, frame_shape, model, stride, batch_size, movement_threshold, imgsz,
+                use_roi):
+    """
+    Crop left offsets for every frame (stored at `scale`), after
+    stabilization. Like _threshold_reel_frames, the stable box is dropped at
+    every scene cut.
+    """
+    last_stable_bbox = None
+    lefts = []
+    scene_cuts = []
+    next_cut = 0
+    detections = iter_detections(iter(frames), model, stride, batch_size, imgsz, use_roi,
+                                 scene_cuts=scene_cuts)
+    for i, (frame, bbox) in enumerate(detections):
+        while next_cut < len(scene_cuts) and scene_cuts[next_cut] < i:
+            next_cut += 1
+        if next_cut < len(scene_cuts) and scene_cuts[next_cut] == i:
+            last_stable_bbox = None  # New shot: don't carry the old framing over
+        if bbox is not None:
+            bbox = tuple(int(v / scale) for v in bbox)
+        bbox, last_stable_bbox = stabilize_bbox(bbox, last_stable_bbox, frame_shape, movement_threshold)
+        lefts.append(crop_window(frame_shape, bbox[0])[0])
+    return np.array(lefts)
+
+def verify_crop_path(input_video, model=None, stride=DETECTION_STRIDE,
+                     batch_size=DETECTION_BATCH_SIZE, movement_threshold=150,
+                     imgsz=DETECTION_IMGSZ, use_roi=DETECTION_ROI):
+    """
+    Compare the crop path produced with strided, batched, reduced-resolution
+    detection against the per-frame, full-frame baseline (stride 1, batch 1,
+    640px input, no ROI). Returns pixel deviations.
+
+    The clip is decoded once into its frame store, which both passes read.
+    """
+    if model is None:
+        model = load_model()
+    store = frame_store_for(input_video, max(640, imgsz))
+    if store is None:
+        return None
+    baseline = _crop_lefts(store, store.scale, store.source_shape, model, 1, 1,
+                           movement_threshold, 640, False)
+    strided = _crop_lefts(store, store.scale, store.source_shape, model, stride, batch_size,
+                          movement_threshold, imgsz, use_roi)
+    n = min(len(baseline), len(strided))
+    if n == 0:
+        return None
+    diff = np.abs(baseline[:n] - strided[:n])
+    report = {
+        "frames": n,
+        "mean_px": float(diff.mean()),
+        "max_px": int(diff.max()),
+        "frames_over_threshold": int((diff >= movement_threshold).sum()),
+    }
+    print(f"[INFO] Crop path deviation (stride={stride}, batch={batch_size}): {report}")
+    return report
+
+def load_model(weights=DEFAULT_WEIGHTS):
+    """The YOLO model, loaded on first use and shared process-wide (see model_pool)"""
+    return get_yolo_model(weights)
+
+def analyze_centers(input_video, model, detection_stride=DETECTION_STRIDE,
+                    detection_batch_size=DETECTION_BATCH_SIZE, metrics=None,
+                    use_frame_store=USE_FRAME_STORE):
+    """
+    Cheap analysis pass: the person's center x for every frame (NaN where
+    nobody was found), the frame shape and the scene cut frame indices.
+    Frames are not kept (see analysis_frames for use_frame_store).
+    """
+    if metrics is None:
+        metrics = Metrics()
+    centers = []
+    frame_shape = None
+    scene_cuts = []
+    frames, scale, source_shape = analysis_frames(input_video, use_frame_store)
+    detections = iter_detections(
+        frames, model, detection_stride, detection_batch_size, scene_cuts=scene_cuts)
+    for frame, bbox in timed_iter(detections, metrics, "detection"):
+        frame_shape = frame.shape
+        centers.append(np.nan if bbox is None else bbox[0] / scale)
+    if source_shape is not None and frame_shape is not None:
+        frame_shape = source_shape
+    metrics.count("scene_cuts", len(scene_cuts))
+    return np.array(centers, dtype=float), frame_shape, scene_cuts
+
+def _threshold_reel_frames(input_video, model, movement_threshold, detection_stride,
+                           detection_batch_size, metrics, frame_count,
+                           target_width=1080, target_height=1920):
+    """
+    Reel frames following the person, jumping once they move past the
+    threshold. The stable box is dropped at every scene cut.
+    """
+    last_stable_bbox = None
+    scene_cuts = []
+    next_cut = 0
+    detections = iter_detections(
+        prefetch(iter_frames(input_video)), model, detection_stride, detection_batch_size,
+        scene_cuts=scene_cuts)
+    for i, (frame, current_bbox) in enumerate(timed_iter(detections, metrics, "detection")):
+        while next_cut < len(scene_cuts) and scene_cuts[next_cut] < i:
+            next_cut += 1
+        if next_cut < len(scene_cuts) and scene_cuts[next_cut] == i:
+            last_stable_bbox = None  # New shot: don't carry the old framing over
+        current_bbox, last_stable_bbox = stabilize_bbox(
+            current_bbox, last_stable_bbox, frame.shape, movement_threshold)
+
         # Create the frame with current bbox
-        processed_frame = create_reel_frame(frame, current_bbox)
-        processed_frames.append(processed_frame)
-        
-        if i % 10 == 0:
-            print(f"Processed frame {i}/{len(frames)}")
-    
-    # Write processed frames to video
-    for frame in processed_frames:
-        out.write(frame)
-    
-    out.release()
-    print("Video processing complete!")
-    
-    # Convert to web-compatible format and add audio using ffmpeg
+        crop_start = time.perf_counter()
+        reel_frame = create_reel_frame(frame, current_bbox, target_width, target_height)
+        metrics.add_time("crop", time.perf_counter() - crop_start)
+        yield reel_frame
+
+        if i % 100 == 0:
+            print(f"Processed frame {i}/{frame_count}")
+
+def _path_reel_frames(input_video, lefts, crop_width, metrics, frame_count,
+                      target_width=1080, target_height=1920):
+    """Reel frames cropped at precomputed left offsets"""
+    for i, frame in enumerate(prefetch(iter_frames(input_video))):
+        crop_start = time.perf_counter()
+        left = int(lefts[min(i, len(lefts) - 1)])
+        reel_frame = cv2.resize(frame[:, left:left + crop_width], (target_width, target_height))
+        metrics.add_time("crop", time.perf_counter() - crop_start)
+        yield reel_frame
+
+        if i % 100 == 0:
+            print(f"Rendered frame {i}/{frame_count}")
+
+def _encode_reel(input_video, output_video, reel_frames, fps, filter_sub, ffmpeg_threads, metrics,
+                 encode_profile="publish"):
+    """
+    Pipe reel frames into ffmpeg (adding audio and subtitles) and move the
+    result to output_video. Returns the number of frames written.
+    """
+    # Frames are piped straight into ffmpeg, which also adds audio and subtitles
     web_output = output_video.replace('.mp4', '_web.mp4')
+    out = QueuedFrameWriter(FFmpegFrameWriter(
+        web_output, fps, reel_size(get_encode_profile(encode_profile)), audio_source=input_video,
+        video_filter=filter_sub, threads=ffmpeg_threads, encode_profile=encode_profile))
+    processed = 0
 
     try:
-        if filter_sub:
-            subprocess.run([
-                'ffmpeg', '-y',
-                '-i', temp_video,  # Processed video
-                '-i', input_video,  # Original video (for audio)
-                '-c:v', 'libx264',  # Video codec
-                '-preset', 'fast',
-                '-crf', '23',
-                '-c:a', 'aac',  # Audio codec
-                '-map', '0:v:0',  # Use video from first input
-                '-map', '1:a:0?',  # Use audio from second input if it exists
-                '-shortest',  # End when shortest input ends
-                '-movflags', '+faststart',
-                '-vf', filter_sub,
-                web_output
-            ], check=True)
-        else:
-            subprocess.run([
-                'ffmpeg', '-y',
-                '-i', temp_video,  # Processed video
-                '-i', input_video,  # Original video (for audio)
-                '-c:v', 'libx264',  # Video codec
-                '-preset', 'fast',
-                '-crf', '23',
-                '-c:a', 'aac',  # Audio codec
-                '-map', '0:v:0',  # Use video from first input
-                '-map', '1:a:0?',  # Use audio from second input if it exists
-                '-shortest',  # End when shortest input ends
-                '-movflags', '+faststart',
-                web_output
-            ], check=True)
-        
-        # Clean up temporary files
-        os.remove(temp_video)
-        
+        for reel_frame in reel_frames:
+            out.write(reel_frame)
+            processed += 1
+
+        if not processed:
+            print("No frames found in the video")
+            try:
+                out.release()
+            except subprocess.CalledProcessError:
+                pass
+            if os.path.exists(web_output):
+                os.remove(web_output)
+            return 0
+
+        release_start = time.perf_counter()
+        out.release()
+        metrics.add_time("encode", out.busy_seconds + time.perf_counter() - release_start)
+
         # Replace original output with web-compatible version
         os.replace(web_output, output_video)
-        
+
         print("Final video with audio created successfully!")
-    except subprocess.CalledProcessError as e:
-        print(f"Error running ffmpeg: {e}")
-        if os.path.exists(temp_video):
-            os.remove(temp_video)
+        return processed
+    except Exception as e:
+        if isinstance(e, subprocess.CalledProcessError):
+            print(f"Error running ffmpeg: {e}")
+            print(e.stderr)
+        try:
+            out.release()
+        except Exception:
+            pass
         if os.path.exists(web_output):
             os.remove(web_output)
         raise
 
+def write_crop_commands(lefts, fps, path, target="crop@reel"):
+    """
+    Write an ffmpeg sendcmd script that moves the crop window to lefts[i]
+    at frame i; only frames where the offset changes get a command.
+    """
+    lefts = np.asarray(lefts, dtype=int)
+    changes = np.flatnonzero(np.diff(lefts, prepend=lefts[0] - 1)) if len(lefts) else []
+    with open(path, "w", encoding="utf-8") as f:
+        for i in changes:
+            # Half a frame early so rounding never applies a command one frame late
+            f.write(f"{max(0.0, (i - 0.5) / fps):.4f} {target} x {lefts[i]};\n")
+    return len(changes)
+
+def _render_with_ffmpeg(input_video, output_video, lefts, crop_width, frame_shape, fps, filter_sub,
+                        ffmpeg_threads, metrics, encode_profile="publish"):
+    """
+    Render the reel in one ffmpeg process from the crop path: crop, scale,
+    subtitles and audio all happen in the filter graph. Returns the number
+    of frames rendered.
+    """
+    web_output = output_video.replace('.mp4', '_web.mp4')
+    commands_path = output_video.replace('.mp4', '_crop.cmd')
+    with metrics.stage("encode"):
+        n_commands = write_crop_commands(lefts, fps, commands_path)
+        cmd = build_crop_render_command(
+            input_video, web_output, commands_path, crop_width, frame_shape[0], int(lefts[0]),
+            reel_size(get_encode_profile(encode_profile)), video_filter=filter_sub,
+            threads=ffmpeg_threads, encode_profile=encode_profile)
+        try:
+            subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+            os.replace(web_output, output_video)
+        except subprocess.CalledProcessError as e:
+            print(f"Error running ffmpeg: {e}")
+            print(e.stderr)
+            if os.path.exists(web_output):
+                os.remove(web_output)
+            raise
+        finally:
+            os.remove(commands_path)
+    print(f"Final video rendered by ffmpeg ({n_commands} crop moves)!")
+    return len(lefts)
+
+def save_crop_path(path, lefts, crop_width, frame_shape):
+    """Store a planned crop path atomically (see process_video_with_stabilization)"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        np.savez(f, lefts=np.asarray(lefts, dtype=int), crop_width=crop_width,
+                 frame_shape=np.asarray(frame_shape, dtype=int))
+    os.replace(tmp_path, path)
+
+def load_crop_path(path):
+    """(lefts, crop_width, frame_shape) saved by save_crop_path, or None"""
+    try:
+        with np.load(path) as data:
+            return data["lefts"], int(data["crop_width"]), tuple(int(v) for v in data["frame_shape"])
+    except (OSError, ValueError, KeyError):
+        return None
+
+def process_video_with_stabilization(input_video, output_video, filter_sub=None, movement_threshold=150,
+                                     detection_stride=DETECTION_STRIDE,
+                                     detection_batch_size=DETECTION_BATCH_SIZE,
+                                     model=None, ffmpeg_threads=None, metrics=None,
+                                     camera_mode=CAMERA_MODE, encode_profile="publish",
+                                     render_mode=REEL_RENDER, crop_path=None, reuse_crop_path=False):
+    """
+    Process video with stabilization to reduce jitter.
+
+    camera_mode "smooth" first runs a cheap analysis pass collecting the
+    person's position per frame, plans a smoothed, speed-limited crop path
+    from it (camera_path.plan_camera_path) and then renders the crops in a
+    second decode pass; every shot (scene cuts are found by iter_detections)
+    is planned on its own. "speaker" does the same but follows whoever is
+    talking among several people (see active_speaker). "threshold" renders
+    in a single pass, keeping the crop fixed until the person moves more
+    than `movement_threshold` pixels.
+
+    Frames are streamed: decoding and encoding run on their own threads,
+    connected by bounded queues, so peak memory does not grow with the
+    length of the clip. YOLO runs in batches on every `detection_stride`-th
+    frame; use a stride and batch size of 1 for per-frame detection.
+
+    The reel is encoded with the named `encode_profile` (see
+    ffmpeg_utils.ENCODE_PROFILES), which also sets its resolution.
+
+    render_mode "frames" crops and resizes every frame in Python and pipes
+    it to ffmpeg. "ffmpeg" only runs the analysis pass in Python: the crop
+    path is exported as a sendcmd script and a single ffmpeg process does
+    crop, scale, subtitles and audio (the threshold camera's path then
+    comes from a separate analysis pass instead of the render loop).
+
+    With `crop_path` the planned crop path is saved to that file, and with
+    `reuse_crop_path` an existing one is rendered without analysing the
+    clip again (e.g. when only the subtitles changed, see segment_manifest).
+    The threshold camera then also plans its path in an analysis pass.
+
+    Pass an already loaded `model` to avoid reloading YOLO for every clip.
+    Stage timings (detection, path, crop, encode, render) and the frame
+    count are added to `metrics` when given.
+    """
+    if metrics is None:
+        metrics = Metrics()
+    render_start = time.perf_counter()
+    fps, frame_count = get_video_properties(input_video)
+    print(f"Processing {frame_count} frames...")
+
+    target_width, target_height = reel_size(get_encode_profile(encode_profile))
+    if render_mode not in ("frames", "ffmpeg"):
+        raise ValueError(f"Unknown render_mode: {render_mode}")
+    saved = load_crop_path(crop_path) if crop_path and reuse_crop_path else None
+    if saved is None and model is None:
+        model = load_model()
+
+    if saved is not None:
+        print(f"[CACHE] Reusing the crop path in {crop_path}.")
+        lefts, crop_width, frame_shape = saved
+        reel_frames = None  # Rendered from lefts below
+    elif camera_mode == "threshold" and (render_mode == "ffmpeg" or crop_path):
+        frames, scale, frame_shape = analysis_frames(input_video, USE_FRAME_STORE)
+        if frame_shape is None:
+            first = get_first_frame(input_video)
+            frame_shape = first.shape if first is not None else None
+        if frame_shape is None:
+            print("No frames found in the video")
+            return
+        with metrics.stage("detection"):
+            lefts = _crop_lefts(frames, scale, frame_shape, model, detection_stride,
+                                detection_batch_size, movement_threshold, DETECTION_IMGSZ, DETECTION_ROI)
+        crop_width = crop_width_for(frame_shape)
+        reel_frames = None  # Rendered from lefts below
+    elif camera_mode == "smooth":
+        centers, frame_shape, scene_cuts = analyze_centers(
+            input_video, model, detection_stride, detection_batch_size, metrics)
+        if frame_shape is None:
+            print("No frames found in the video")
+            return
+        with metrics.stage("path"):
+            crop_width = crop_width_for(frame_shape)
+            # Each shot gets its own path; the crop jumps at cuts
+            lefts = plan_camera_path(centers, frame_shape[1], crop_width, fps,
+                                     CAMERA_SMOOTHING_SECONDS, CAMERA_MAX_SPEED, breaks=scene_cuts)
+        reel_frames = None  # Rendered from lefts below
+    elif camera_mode == "speaker":
+        # Imported here: active_speaker builds on this module's detection helpers
+        from active_speaker import analyze_active_speaker
+        centers, frame_shape, switches = analyze_active_speaker(
+            input_video, model, fps, detection_stride, detection_batch_size, metrics)
+        if frame_shape is None:
+            print("No frames found in the video")
+            return
+        with metrics.stage("path"):
+            crop_width = crop_width_for(frame_shape)
+            lefts = plan_camera_path(centers, frame_shape[1], crop_width, fps,
+                                     CAMERA_SMOOTHING_SECONDS, CAMERA_MAX_SPEED, breaks=switches)
+        reel_frames = None  # Rendered from lefts below
+    elif camera_mode == "threshold":
+        reel_frames = _threshold_reel_frames(
+            input_video, model, movement_threshold, detection_stride, detection_batch_size,
+            metrics, frame_count, target_width, target_height)
+    else:
+        raise ValueError(f"Unknown camera_mode: {camera_mode}")
+
+    if crop_path and saved is None and reel_frames is None:
+        save_crop_path(crop_path, lefts, crop_width, frame_shape)
+
+    if render_mode == "ffmpeg":
+        processed = _render_with_ffmpeg(input_video, output_video, lefts, crop_width, frame_shape,
+                                        fps, filter_sub, ffmpeg_threads, metrics, encode_profile)
+    else:
+        if reel_frames is None:
+            reel_frames = _path_reel_frames(input_video, lefts, crop_width, metrics, frame_count,
+                                            target_width, target_height)
+        processed = _encode_reel(input_video, output_video, reel_frames, fps, filter_sub,
+                                 ffmpeg_threads, metrics, encode_profile)
+    if processed:
+        metrics.count("frames", processed)
+        metrics.add_time("render", time.perf_counter() - render_start)
+
 
 def main():
 
     # Load YOLOv8 model
-    model = YOLO('yolov8n.pt')  # Load the smallest YOLOv8 model
+    model = load_model('yolov8n.pt')  # Load the smallest YOLOv8 model
 
     # Process video
     input_video = "original_video.mp4"
     output_video = "output_reel.mp4"
-    process_video_with_stabilization(input_video, output_video, model)
+    process_video_with_stabilization(input_video, output_video, model=model)
 
 
 if __name__ == "__main__":
@@ -5,3 +5,107 @@ load_dotenv()
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 OUTPUT_FOLDER = "topic_segments"
+
+# Max number of decoded/processed frames buffered between pipeline stages
+FRAME_QUEUE_SIZE = int(os.getenv("FRAME_QUEUE_SIZE", "32"))
+
+# Run YOLO on every Nth frame (and on scene cuts), N keyframes per batch
+DETECTION_STRIDE = int(os.getenv("DETECTION_STRIDE", "5"))
+DETECTION_BATCH_SIZE = int(os.getenv("DETECTION_BATCH_SIZE", "8"))
+# Mean absolute difference (0-255) between downscaled frames that marks a cut
+SCENE_CHANGE_THRESHOLD = float(os.getenv("SCENE_CHANGE_THRESHOLD", "30"))
+# A cut must also change the brightness histogram (Bhattacharyya distance)
+SCENE_HIST_THRESHOLD = float(os.getenv("SCENE_HIST_THRESHOLD", "0.2"))
+# Keyframes differing less than this from the last detected one reuse its box
+STATIC_SHOT_THRESHOLD = float(os.getenv("STATIC_SHOT_THRESHOLD", "1.5"))
+
+# Number of segments rendered concurrently (each worker holds its own YOLO model)
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", "1"))
+
+# How segments are cut from the source: "seek", "copy" or "single" (see ffmpeg_utils.CUT_MODES)
+CUT_MODE = os.getenv("CUT_MODE", "seek")
+
+# On-disk cache for downloads, transcripts and GPT segmentations
+CACHE_DIR = os.getenv("CACHE_DIR", ".cache")
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", str(20 * 1024 ** 3)))
+
+# Optional OpenAI-compatible endpoint (e.g. a local stub server for tests)
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+# Long transcripts are segmented in overlapping windows, several at a time
+SEGMENT_WINDOW_TOKENS = int(os.getenv("SEGMENT_WINDOW_TOKENS", "3500"))
+SEGMENT_WINDOW_OVERLAP_TOKENS = int(os.getenv("SEGMENT_WINDOW_OVERLAP_TOKENS", "400"))
+SEGMENT_CONCURRENCY = int(os.getenv("SEGMENT_CONCURRENCY", "4"))
+SEGMENT_REQUESTS_PER_MINUTE = int(os.getenv("SEGMENT_REQUESTS_PER_MINUTE", "20"))
+
+# Subtitle style: "lines", "karaoke" or "popon" (see subtitle_utils.SUBTITLE_STYLES)
+SUBTITLE_STYLE = os.getenv("SUBTITLE_STYLE", "lines")
+
+# Where main() writes per-stage timings as JSON (empty to disable)
+METRICS_PATH = os.getenv("METRICS_PATH", "metrics.json")
+
+# Keyframes are shrunk to this long side before inference and, once a person
+# is found, searched first in a region ROI_MARGIN times the last box size
+# (grown per stride since that box); boxes cut off by the region are retried
+DETECTION_IMGSZ = int(os.getenv("DETECTION_IMGSZ", "416"))
+DETECTION_ROI = os.getenv("DETECTION_ROI", "1") == "1"
+ROI_MARGIN = float(os.getenv("ROI_MARGIN", "1.6"))
+
+# Vertical crop camera: "smooth" (planned, speed-limited path), "speaker"
+# (follow the active speaker) or "threshold" (jumps)
+CAMERA_MODE = os.getenv("CAMERA_MODE", "smooth")
+CAMERA_SMOOTHING_SECONDS = float(os.getenv("CAMERA_SMOOTHING_SECONDS", "1.0"))
+# Fastest pan allowed, in frame widths per second
+CAMERA_MAX_SPEED = float(os.getenv("CAMERA_MAX_SPEED", "0.3"))
+
+# Active-speaker framing (CAMERA_MODE=speaker): switch to another person only
+# when their mouth motion beats the current one by this margin for this long
+SPEAKER_SWITCH_MARGIN = float(os.getenv("SPEAKER_SWITCH_MARGIN", "0.3"))
+SPEAKER_MIN_HOLD_SECONDS = float(os.getenv("SPEAKER_MIN_HOLD_SECONDS", "1.0"))
+
+# Videos processed at the same time by job_runner (downloads overlap rendering)
+JOB_CONCURRENCY = int(os.getenv("JOB_CONCURRENCY", "2"))
+
+# Job queue (job_queue.py): SQLite database, per-job working directories,
+# worker processes, how often idle workers poll and how often a job is tried
+JOB_DB_PATH = os.getenv("JOB_DB_PATH", "jobs.db")
+JOB_ROOT = os.getenv("JOB_ROOT", "jobs")
+QUEUE_WORKERS = int(os.getenv("QUEUE_WORKERS", "1"))
+QUEUE_POLL_SECONDS = float(os.getenv("QUEUE_POLL_SECONDS", "2"))
+MAX_JOB_ATTEMPTS = int(os.getenv("MAX_JOB_ATTEMPTS", "3"))
+
+# "full" downloads the whole video first; "sections" segments the transcript
+# first and fetches only the segments' ranges, padded by SECTION_PADDING
+# seconds (ranges less than SECTION_MERGE_GAP apart are fetched as one)
+DOWNLOAD_MODE = os.getenv("DOWNLOAD_MODE", "full")
+SECTION_PADDING = float(os.getenv("SECTION_PADDING", "2.0"))
+SECTION_MERGE_GAP = float(os.getenv("SECTION_MERGE_GAP", "10.0"))
+
+# Topic segmentation: "gpt" (OpenAI) or "local" (sentence embeddings, see
+# local_segmenter.py); local segments last SEGMENT_MIN/MAX_SECONDS
+SEGMENTATION_BACKEND = os.getenv("SEGMENTATION_BACKEND", "gpt")
+SEGMENT_EMBEDDING_MODEL = os.getenv("SEGMENT_EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+SEGMENT_EMBED_BATCH_SIZE = int(os.getenv("SEGMENT_EMBED_BATCH_SIZE", "64"))
+SEGMENT_MIN_SECONDS = float(os.getenv("SEGMENT_MIN_SECONDS", "20"))
+SEGMENT_MAX_SECONDS = float(os.getenv("SEGMENT_MAX_SECONDS", "90"))
+
+# Encode profile for every ffmpeg encode: "draft", "preview" or "publish"
+# (see ffmpeg_utils.ENCODE_PROFILES); draft/preview reels go to a subfolder.
+# ENCODE_THREADS > 0 replaces the per-profile encoder thread caps
+ENCODE_PROFILE = os.getenv("ENCODE_PROFILE", "publish")
+ENCODE_THREADS = int(os.getenv("ENCODE_THREADS", "0"))
+
+# Analysis passes read downscaled frames (long side FRAME_STORE_SIZE) from a
+# memory-mapped store in the cache instead of decoding the clip again.
+# Stores have their own LRU budget, so they never evict cached downloads
+USE_FRAME_STORE = os.getenv("USE_FRAME_STORE", "0") == "1"
+FRAME_STORE_SIZE = int(os.getenv("FRAME_STORE_SIZE", "640"))
+FRAME_STORE_MAX_BYTES = int(os.getenv("FRAME_STORE_MAX_BYTES", str(10 * 1024 ** 3)))
+
+# How vertical reels are rendered: "frames" (crop/resize in Python, frames
+# piped to ffmpeg) or "ffmpeg" (crop path exported as a sendcmd script, one
+# ffmpeg process crops, scales and burns subtitles)
+REEL_RENDER = os.getenv("REEL_RENDER", "frames")
+
+# Rerenders only redo the parts of a segment (cut, subtitles, crop path, reel)
+# whose inputs changed since the folder's manifest.json; 0 renders all
+INCREMENTAL_RENDER = os.getenv("INCREMENTAL_RENDER", "1") == "1"
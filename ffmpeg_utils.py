@@ -0,0 +1,231 @@
+import subprocess
+import tempfile
+
+from config import ENCODE_THREADS
+
+# Named encode settings, from fastest to best looking:
+#   preset/crf  - libx264 speed/quality trade-off
+#   threads     - most encoder threads; small frames gain little from more
+#                 (the caller's share of the cores caps it further)
+#   reel_height - height of the 9:16 vertical reel
+#   max_height  - landscape segment cuts are scaled down to at most this
+#                 height (None keeps the source resolution); cuts that a
+#                 vertical reel is cropped from keep at least reel_height
+ENCODE_PROFILES = {
+    "draft": {"preset": "ultrafast", "crf": 32, "threads": 2, "reel_height": 640, "max_height": 360},
+    "preview": {"preset": "veryfast", "crf": 28, "threads": 4, "reel_height": 960, "max_height": 540},
+    "publish": {"preset": "fast", "crf": 23, "threads": 8, "reel_height": 1920, "max_height": None},
+}
+
+def get_encode_profile(name):
+    """Settings of a named encode profile; ENCODE_THREADS overrides its threads"""
+    if name not in ENCODE_PROFILES:
+        raise ValueError(f"encode profile must be one of {tuple(ENCODE_PROFILES)}, got {name!r}")
+    profile = dict(ENCODE_PROFILES[name])
+    if ENCODE_THREADS:
+        profile["threads"] = ENCODE_THREADS
+    return profile
+
+def reel_size(profile):
+    """(width, height) of the vertical reel, both even as yuv420p requires"""
+    height = profile["reel_height"]
+    return (height * 9 // 16) // 2 * 2, height
+
+def cut_height(profile, vertical=False):
+    """Most height of a segment cut, or None to keep the source's"""
+    if profile["max_height"] and vertical:
+        # The reel is a full-height crop of the cut; a lower cut would be upscaled
+        return max(profile["max_height"], profile["reel_height"])
+    return profile["max_height"]
+
+def video_encode_args(profile, threads=None):
+    """libx264 arguments for a profile, using at most its threads and `threads` (when given)"""
+    caps = [t for t in (profile["threads"], threads) if t]
+    threads = min(caps) if caps else None
+    args = [
+        "-c:v", "libx264",
+        "-preset", profile["preset"],
+        "-crf", str(profile["crf"]),
+    ]
+    if threads:
+        args += ["-threads", str(threads)]
+    return args
+
+
+class FFmpegFrameWriter:
+    """
+    Drop-in replacement for cv2.VideoWriter that pipes raw BGR frames over
+    stdin into a single ffmpeg process. The same process can mux audio from
+    another file and apply a video filter (e.g. burned-in subtitles), so each
+    reel is encoded exactly once and no intermediate file is written.
+    """
+
+    def __init__(self, output_path, fps, size, audio_source=None, video_filter=None,
+                 threads=None, encode_profile="publish"):
+        width, height = size
+        cmd = [
+            'ffmpeg', '-y',
+            '-hide_banner', '-loglevel', 'error',
+            '-f', 'rawvideo',
+            '-pix_fmt', 'bgr24',
+            '-s', f'{width}x{height}',
+            '-r', str(fps),
+            '-i', '-',  # Processed frames from stdin
+        ]
+        if audio_source:
+            cmd += ['-i', audio_source]  # Original video (for audio)
+        cmd += ['-map', '0:v:0']
+        if audio_source:
+            cmd += [
+                '-map', '1:a:0?',  # Use audio from second input if it exists
+                '-c:a', 'aac',
+                '-shortest',  # End when shortest input ends
+            ]
+        if video_filter:
+            cmd += ['-vf', video_filter]
+        cmd += video_encode_args(get_encode_profile(encode_profile), threads)
+        cmd += [
+            '-pix_fmt', 'yuv420p',
+            '-movflags', '+faststart',
+            output_path,
+        ]
+        self.cmd = cmd
+        # ffmpeg's stderr goes to a file: an unread pipe could fill up and stall the encode
+        self.stderr = tempfile.TemporaryFile()
+        self.process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stderr=self.stderr)
+
+    def write(self, frame):
+        data = frame.data if frame.flags.c_contiguous else frame.tobytes()
+        try:
+            self.process.stdin.write(data)
+        except BrokenPipeError:
+            # ffmpeg exited early; release() reports why
+            self.release()
+            raise
+
+    def release(self):
+        if self.stderr.closed:
+            return  # Already released
+        if self.process.stdin and not self.process.stdin.closed:
+            try:
+                self.process.stdin.close()
+            except BrokenPipeError:
+                pass
+        returncode = self.process.wait()
+        self.stderr.seek(0)
+        stderr = self.stderr.read().decode(errors="replace")
+        self.stderr.close()
+        if returncode != 0:
+            raise subprocess.CalledProcessError(returncode, self.cmd, stderr=stderr)
+
+
+# How segments are cut from the source video:
+#   seek   - one ffmpeg per segment, seeking on the input (no decode from 0)
+#   copy   - like seek, but stream copy without re-encoding; cuts snap to
+#            the nearest keyframe, so only use it when that is acceptable
+#   single - one ffmpeg decodes the source once and writes every segment
+CUT_MODES = ("seek", "copy", "single")
+
+def resolve_cut_mode(cut_mode, vertical):
+    """
+    The cut mode to use. A copy cut starts at the keyframe before the
+    segment, so subtitles burned into the vertical reel (timed from the
+    segment start) would run late; vertical renders cut with "seek" instead.
+    """
+    if cut_mode not in CUT_MODES:
+        raise ValueError(f"cut_mode must be one of {CUT_MODES}, got {cut_mode!r}")
+    if cut_mode == "copy" and vertical:
+        print("[WARN] CUT_MODE=copy only suits horizontal clips; cutting with 'seek' for the vertical reels.")
+        return "seek"
+    return cut_mode
+
+def _segment_encode_args(threads=None, encode_profile="publish", vertical=False):
+    profile = get_encode_profile(encode_profile)
+    height = cut_height(profile, vertical)
+    args = []
+    if height:
+        # -2 keeps the aspect ratio with an even width; never upscale
+        args += ["-vf", f"scale=-2:'min({height},ih)'"]
+    args += video_encode_args(profile, threads)
+    args += [
+        "-c:a", "aac",
+        "-b:a", "128k",
+    ]
+    return args
+
+def build_cut_command(video_path, start, duration, output_path, mode="seek", threads=None,
+                      encode_profile="publish", vertical=False):
+    """
+    ffmpeg command cutting [start, start + duration) out of video_path,
+    re-encoded with the named encode profile (unless mode is "copy"), at a
+    height a vertical reel can be cropped from when `vertical`
+    """
+    if mode not in ("seek", "copy"):
+        raise ValueError(f"Unsupported per-segment cut mode: {mode}")
+    cmd = [
+        "ffmpeg", "-y",
+        "-ss", str(start),  # Input seeking: jump to the nearest keyframe before start
+        "-i", video_path,
+        "-t", str(duration),
+    ]
+    if mode == "copy":
+        cmd += ["-c", "copy", "-avoid_negative_ts", "make_zero"]
+    else:
+        cmd += _segment_encode_args(threads, encode_profile, vertical)
+    cmd += ["-movflags", "+faststart", output_path]
+    return cmd
+
+def build_single_pass_cut_command(video_path, cuts, threads=None, encode_profile="publish",
+                                  vertical=False):
+    """
+    One ffmpeg command that decodes video_path once and fans out every cut.
+    `cuts` is a list of (start, duration, output_path); decoding stops at the
+    end of the last cut. `vertical` as for build_cut_command.
+    """
+    last_end = max(start + duration for start, duration, _ in cuts)
+    cmd = ["ffmpeg", "-y", "-to", str(last_end), "-i", video_path]
+    for start, duration, output_path in cuts:
+        cmd += [
+            "-map", "0:v:0",
+            "-map", "0:a:0?",
+            "-ss", str(start),  # Output option: drop frames before start
+            "-t", str(duration),
+        ]
+        cmd += _segment_encode_args(threads, encode_profile, vertical)
+        cmd += ["-movflags", "+faststart", output_path]
+    return cmd
+
+def build_crop_render_command(video_path, output_path, commands_path, crop_width, crop_height,
+                              first_left, size, video_filter=None, threads=None,
+                              encode_profile="publish"):
+    """
+    One ffmpeg command rendering a vertical reel straight from video_path:
+    a crop window moved per frame by the sendcmd script at commands_path,
+    scaling to `size`, an extra filter (e.g. subtitles) and the original
+    audio. No frame passes through Python.
+    """
+    width, height = size
+    escaped_commands = commands_path.replace("'", "'\\''")
+    filters = [
+        "setpts=PTS-STARTPTS",  # sendcmd times count from the start of the reel
+        f"sendcmd=f='{escaped_commands}'",
+        f"crop@reel=w={crop_width}:h={crop_height}:x={first_left}:y=0",
+        f"scale={width}:{height}",
+    ]
+    if video_filter:
+        filters.append(video_filter)
+    cmd = [
+        "ffmpeg", "-y", "-hide_banner", "-loglevel", "error",
+        "-i", video_path,
+        "-map", "0:v:0",
+        "-map", "0:a:0?",
+        "-vf", ",".join(filters),
+    ]
+    cmd += video_encode_args(get_encode_profile(encode_profile), threads)
+    cmd += [
+        "-pix_fmt", "yuv420p",
+        "-c:a", "aac",
+        "-movflags", "+faststart",
+        output_path,
+    ]
+    return cmd
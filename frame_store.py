@@ -0,0 +1,143 @@
+"""
+Memory-mapped store of downscaled analysis frames.
+
+A clip is decoded once; every frame is shrunk so its long side is at most
+FRAME_STORE_SIZE and appended to a raw uint8 file, with a small JSON index
+(frame count, shapes, scale, source) next to it. Analysis passes then read
+the frames back through np.memmap: indexing returns views into the page
+cache, so revisiting frames needs neither another decode nor the clip in
+RAM. Stores live in the on-disk cache (stage "frames") with their own
+FRAME_STORE_MAX_BYTES budget: the least recently used stores are evicted
+when it is exceeded, never the other cached stages.
+"""
+import json
+import os
+
+import cv2
+import numpy as np
+
+from cache_utils import Cache, make_key
+from config import FRAME_STORE_SIZE, FRAME_STORE_MAX_BYTES
+
+
+class FrameStore:
+    """
+    Read-only view of a stored clip. `len(store)`, `store[i]` and iteration
+    give (h, w, 3) BGR frames without copying; `scale` maps coordinates in
+    stored frames back to the source (divide by it).
+    """
+
+    def __init__(self, data_path, index):
+        self.data_path = data_path
+        self.index = index
+        height, width = index["shape"]
+        shape = (index["frames"], height, width, 3)
+        if index["frames"]:
+            self.frames = np.memmap(data_path, dtype=np.uint8, mode="r", shape=shape)
+        else:
+            self.frames = np.zeros(shape, dtype=np.uint8)
+
+    @property
+    def scale(self):
+        return self.index["scale"]
+
+    @property
+    def source_shape(self):
+        """(height, width, 3) of the original frames"""
+        return tuple(self.index["source_shape"]) + (3,)
+
+    @property
+    def fps(self):
+        return self.index["fps"]
+
+    def __len__(self):
+        return len(self.frames)
+
+    def __getitem__(self, i):
+        return self.frames[i]
+
+    def __iter__(self):
+        return iter(self.frames)
+
+    @classmethod
+    def open(cls, data_path, index_path):
+        """The store at these paths, or None if it is missing or incomplete"""
+        try:
+            with open(index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+            height, width = index["shape"]
+            expected = index["frames"] * height * width * 3
+            if os.path.getsize(data_path) != expected:
+                return None
+        except (OSError, ValueError, KeyError):
+            return None
+        return cls(data_path, index)
+
+    @classmethod
+    def build(cls, input_video, data_path, index_path, long_side=FRAME_STORE_SIZE):
+        """Decode input_video once into a new store"""
+        cap = cv2.VideoCapture(input_video)
+        if not cap.isOpened():
+            print(f"Error: Could not open video file {input_video}")
+            return None
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30
+        tmp_path = data_path + ".tmp"
+        n = 0
+        size = None
+        source_shape = None
+        try:
+            with open(tmp_path, "wb") as f:
+                while True:
+                    ret, frame = cap.read()
+                    if not ret:
+                        break
+                    if size is None:
+                        source_shape = frame.shape[:2]
+                        scale = min(1.0, long_side / max(source_shape))
+                        size = (max(1, int(round(source_shape[1] * scale))),
+                                max(1, int(round(source_shape[0] * scale))))
+                    if size != (frame.shape[1], frame.shape[0]):
+                        frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+                    f.write(np.ascontiguousarray(frame).data)
+                    n += 1
+        finally:
+            cap.release()
+        if size is None:
+            os.remove(tmp_path)
+            return None
+        index = {
+            "source": os.path.abspath(input_video),
+            "frames": n,
+            "shape": [size[1], size[0]],
+            "source_shape": list(source_shape),
+            "scale": size[0] / source_shape[1],
+            "fps": fps,
+        }
+        os.replace(tmp_path, data_path)
+        with open(index_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(index, f)
+        os.replace(index_path + ".tmp", index_path)
+        return cls(data_path, index)
+
+
+def frame_store_for(input_video, long_side=FRAME_STORE_SIZE, cache=None):
+    """
+    The frame store of a video, decoding it into a new one only when no
+    store exists for this exact file (path, size, mtime) and size.
+    Returns None if the video can't be read.
+    """
+    if cache is None:
+        cache = Cache()
+    st = os.stat(input_video)
+    key = make_key("frames", os.path.abspath(input_video), st.st_size, st.st_mtime, long_side)
+    data_path = cache.path("frames", key, ".frames")
+    index_path = cache.path("frames", key, ".json")
+    # get_file also refreshes the entry's LRU time
+    store = FrameStore.open(data_path, index_path) if cache.get_file("frames", key, ".frames") else None
+    if store is not None:
+        print(f"[CACHE] Using stored analysis frames for {input_video}.")
+        return store
+    store = FrameStore.build(input_video, data_path, index_path, long_side)
+    if store is not None:
+        cache.evict(keep=data_path, stages=("frames",), max_bytes=FRAME_STORE_MAX_BYTES)
+    return store
@@ -1,11 +1,21 @@
+import asyncio
 import json
 import re
-import openai
-from openai.resources.chat.completions import ChatCompletion
+import time
+from typing import TYPE_CHECKING
 
-from config import OPENAI_API_KEY
+from config import (
+    OPENAI_API_KEY,
+    OPENAI_BASE_URL,
+    SEGMENT_WINDOW_TOKENS,
+    SEGMENT_WINDOW_OVERLAP_TOKENS,
+    SEGMENT_CONCURRENCY,
+    SEGMENT_REQUESTS_PER_MINUTE,
+)
+from model_pool import get_openai_client
 
-client = openai.OpenAI(api_key=OPENAI_API_KEY)
+if TYPE_CHECKING:
+    from openai.resources.chat.completions import ChatCompletion
 
 def create_single_string_from_transcript(transcript_data):
     """
@@ -18,39 +28,49 @@ def create_single_string_from_transcript(transcript_data):
         lines.append(f"[start={start}] {text}")
     return "\n".join(lines)
 
+# Model used for segmentation; part of the cache key together with the prompt
+SEGMENT_MODEL = "gpt-4"
+
+SYSTEM_PROMPT = (
+    "You are a helpful assistant that segments a YouTube transcript of an interview.\n"
+    "- The interview has two people: an interviewer and a guest.\n"
+    "- The interviewer typically starts with a question or new topic.\n"
+    "- The transcript lines are provided, each in the format: [start=TIMESTAMP] TEXT.\n"
+    "- Please group consecutive lines so that each segment starts with the interviewer's question.\n"
+    "- Make sure you use good time windows for each timestamped text so that the segment doesn't end abruptly and always make sure two segments don't have overlapping ideas.\n"
+    "- Also make sure the segments are not too short, at least 20 seconds long and not more than 1 minute 30 seconds.\n"
+    "- Use the 'start' time of that question as 'start'.\n"
+    "- Use the 'start' time of the next interviewer question as 'end' (or the last line's start if it's the final segment).\n"
+    "- Return valid JSON only: an array of objects, each with:\n"
+    "   { \"topic\": \"...\", \"start\": float, \"end\": float }\n"
+    "- The 'topic' should be a short phrase describing the question or topic.\n"
+    "- 'start' and 'end' must be from the existing [start=...] lines.\n"
+    "- Do not add extra text outside the JSON.\n"
+)
+
+def _user_prompt(transcript_str):
+    return (
+        "Here is the transcript with timestamps:\n\n"
+        f"{transcript_str}\n\n"
+        "Please return only the JSON array as your answer."
+    )
+
 def ask_openai_for_topic_segments(transcript_str):
     """
     Calls GPT to produce a JSON array with {topic, start, end},
     where 'start' and 'end' come from the original transcript lines.
+    Transcripts longer than one window are segmented window by window
+    (see ask_openai_for_topic_segments_chunked).
     """
-    system_prompt = (
-        "You are a helpful assistant that segments a YouTube transcript of an interview.\n"
-        "- The interview has two people: an interviewer and a guest.\n"
-        "- The interviewer typically starts with a question or new topic.\n"
-        "- The transcript lines are provided, each in the format: [start=TIMESTAMP] TEXT.\n"
-        "- Please group consecutive lines so that each segment starts with the interviewer's question.\n"
-        "- Make sure you use good time windows for each timestamped text so that the segment doesn't end abruptly and always make sure two segments don't have overlapping ideas.\n"
-        "- Also make sure the segments are not too short, at least 20 seconds long and not more than 1 minute 30 seconds.\n"
-        "- Use the 'start' time of that question as 'start'.\n"
-        "- Use the 'start' time of the next interviewer question as 'end' (or the last line's start if it's the final segment).\n"
-        "- Return valid JSON only: an array of objects, each with:\n"
-        "   { \"topic\": \"...\", \"start\": float, \"end\": float }\n"
-        "- The 'topic' should be a short phrase describing the question or topic.\n"
-        "- 'start' and 'end' must be from the existing [start=...] lines.\n"
-        "- Do not add extra text outside the JSON.\n"
-    )
-    user_prompt = (
-        "Here is the transcript with timestamps:\n\n"
-        f"{transcript_str[:16000]}\n\n"
-        "Please return only the JSON array as your answer."
-    )
+    if estimate_tokens(transcript_str) > SEGMENT_WINDOW_TOKENS:
+        return ask_openai_for_topic_segments_chunked(transcript_str)
 
     try:
-        response = client.chat.completions.create(
-            model="gpt-4",
+        response = get_openai_client().chat.completions.create(
+            model=SEGMENT_MODEL,
             messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user",   "content": user_prompt}
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user",   "content": _user_prompt(transcript_str)}
             ],
             temperature=0.0,
         )
@@ -59,7 +79,135 @@ def ask_openai_for_topic_segments(transcript_str):
         print(f"[ERROR] OpenAI API Error: {e}")
         return None
 
-def parse_openai_response(response: ChatCompletion):
+def estimate_tokens(text):
+    """
+    Rough token count (about 4 characters per token for English text).
+    """
+    return len(text) // 4 + 1
+
+def split_transcript_windows(transcript_str,
+                             max_tokens=SEGMENT_WINDOW_TOKENS,
+                             overlap_tokens=SEGMENT_WINDOW_OVERLAP_TOKENS):
+    """
+    Split the output of create_single_string_from_transcript into windows of
+    whole lines, each at most max_tokens, overlapping by about overlap_tokens
+    so topics crossing a window edge are seen whole by one of the windows.
+    """
+    lines = transcript_str.split("\n")
+    costs = [estimate_tokens(line) for line in lines]
+    windows = []
+    start = 0
+    while start < len(lines):
+        end = start
+        tokens = 0
+        while end < len(lines) and (end == start or tokens + costs[end] <= max_tokens):
+            tokens += costs[end]
+            end += 1
+        windows.append("\n".join(lines[start:end]))
+        if end >= len(lines):
+            break
+        # Step back so the next window repeats the tail of this one
+        next_start = end
+        overlap = 0
+        while next_start > start + 1 and overlap + costs[next_start - 1] <= overlap_tokens:
+            next_start -= 1
+            overlap += costs[next_start]
+        start = next_start
+    return windows
+
+class AsyncRateLimiter:
+    """
+    Space out requests so that at most `per_minute` start in any minute.
+    """
+
+    def __init__(self, per_minute):
+        self.interval = 60.0 / per_minute if per_minute else 0.0
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+async def _segment_window(async_client, window, semaphore, limiter):
+    async with semaphore:
+        await limiter.wait()
+        try:
+            response = await async_client.chat.completions.create(
+                model=SEGMENT_MODEL,
+                messages=[
+                    {"role": "system", "content": SYSTEM_PROMPT},
+                    {"role": "user",   "content": _user_prompt(window)}
+                ],
+                temperature=0.0,
+            )
+        except Exception as e:
+            print(f"[ERROR] OpenAI API Error: {e}")
+            return None
+    return parse_openai_response(response)
+
+def merge_window_segments(window_results):
+    """
+    Merge the segment lists of overlapping windows. Segments that mostly
+    overlap are duplicates of the same topic seen by two windows (the longer
+    one is kept); small overlaps are trimmed so segments don't overlap.
+    """
+    segments = []
+    for result in window_results:
+        if result:
+            segments.extend(parse_gpt_segments(result))
+    segments.sort(key=lambda x: x["start"])
+
+    merged = []
+    for seg in segments:
+        if merged:
+            prev = merged[-1]
+            overlap = min(prev["end"], seg["end"]) - max(prev["start"], seg["start"])
+            shorter = min(prev["end"] - prev["start"], seg["end"] - seg["start"])
+            if overlap > 0 and overlap >= 0.5 * shorter:
+                if seg["end"] - seg["start"] > prev["end"] - prev["start"]:
+                    merged[-1] = dict(seg)
+                continue
+            if overlap > 0:
+                prev["end"] = seg["start"]
+        merged.append(dict(seg))
+    return merged
+
+async def ask_openai_for_topic_segments_async(transcript_str,
+                                              concurrency=SEGMENT_CONCURRENCY,
+                                              requests_per_minute=SEGMENT_REQUESTS_PER_MINUTE):
+    """
+    Map-reduce segmentation: segment every window concurrently (bounded by
+    `concurrency` and a rate limiter), then merge the boundary segments.
+    """
+    windows = split_transcript_windows(transcript_str)
+    print(f"[INFO] Segmenting transcript in {len(windows)} windows.")
+    semaphore = asyncio.Semaphore(concurrency)
+    limiter = AsyncRateLimiter(requests_per_minute)
+    import openai  # Imported on first use, like the pooled sync client
+    async with openai.AsyncOpenAI(api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL) as async_client:
+        results = await asyncio.gather(*[
+            _segment_window(async_client, window, semaphore, limiter)
+            for window in windows
+        ])
+    failed = sum(1 for r in results if r is None)
+    if failed:
+        print(f"[WARN] {failed} of {len(windows)} windows could not be segmented.")
+    if failed == len(windows):
+        return None
+    return merge_window_segments(results)
+
+def ask_openai_for_topic_segments_chunked(transcript_str):
+    """
+    Blocking wrapper around ask_openai_for_topic_segments_async.
+    """
+    return asyncio.run(ask_openai_for_topic_segments_async(transcript_str))
+
+def parse_openai_response(response: "ChatCompletion"):
     """
     Extract and parse JSON from the OpenAI API response.
     """
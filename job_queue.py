@@ -0,0 +1,358 @@
+"""
+Persistent job queue for processing many podcast URLs:
+
+    python job_queue.py submit URL [URL ...] [--vertical]
+    python job_queue.py work --workers 2
+    python job_queue.py status
+
+Jobs live in a SQLite database. Every job gets its own working directory
+(JOB_ROOT/<id>) holding a JSON checkpoint per finished stage, so a job
+that was interrupted resumes after its last completed stage. Each worker
+process loads YOLO once and keeps it (and the OpenAI client) for all the
+jobs it runs.
+"""
+import argparse
+import json
+import os
+import sqlite3
+import time
+from multiprocessing import Process
+
+from youtube_utils import extract_video_id, download_segment_sections
+from main import fetch_video, fetch_transcript, segment_transcript
+from video_processor import cut_video_with_subtitles
+from cache_utils import Cache
+from metrics import Metrics
+from model_pool import get_yolo_model
+from config import JOB_DB_PATH, JOB_ROOT, QUEUE_WORKERS, QUEUE_POLL_SECONDS, MAX_JOB_ATTEMPTS, DOWNLOAD_MODE
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    url TEXT NOT NULL,
+    vertical INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'queued',
+    stage TEXT,
+    workdir TEXT,
+    worker TEXT,
+    pid INTEGER,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+)
+"""
+
+
+class JobQueue:
+    """
+    SQLite-backed job queue shared by processes on one machine. Job status
+    goes queued -> running -> done/failed; claim() hands each queued job to
+    exactly one worker.
+    """
+
+    def __init__(self, db_path=JOB_DB_PATH, job_root=JOB_ROOT):
+        self.db_path = db_path
+        self.job_root = job_root
+        # Autocommit mode; claim() opens its own write transaction
+        self.conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def submit(self, url, vertical=False):
+        """Queue a URL and return the new job's id"""
+        extract_video_id(url)  # Reject bad URLs before they reach a worker
+        now = time.time()
+        cur = self.conn.execute(
+            "INSERT INTO jobs (url, vertical, created_at, updated_at) VALUES (?, ?, ?, ?)",
+            (url, int(vertical), now, now))
+        job_id = cur.lastrowid
+        workdir = os.path.abspath(os.path.join(self.job_root, str(job_id)))
+        self.conn.execute("UPDATE jobs SET workdir = ? WHERE id = ?", (workdir, job_id))
+        return job_id
+
+    def claim(self, worker):
+        """
+        Mark the oldest queued job as running for `worker` (in this process)
+        and return it, or None
+        """
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = self.conn.execute(
+                "SELECT id FROM jobs WHERE status = 'queued' ORDER BY id LIMIT 1").fetchone()
+            if row is None:
+                self.conn.execute("COMMIT")
+                return None
+            self.conn.execute(
+                "UPDATE jobs SET status = 'running', worker = ?, pid = ?, attempts = attempts + 1, "
+                "updated_at = ? WHERE id = ?",
+                (worker, os.getpid(), time.time(), row["id"]))
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        return self.get(row["id"])
+
+    def checkpoint(self, job_id, stage):
+        """Record the last stage a job completed"""
+        self.conn.execute("UPDATE jobs SET stage = ?, updated_at = ? WHERE id = ?",
+                          (stage, time.time(), job_id))
+
+    def finish(self, job_id):
+        self.conn.execute("UPDATE jobs SET status = 'done', error = NULL, updated_at = ? WHERE id = ?",
+                          (time.time(), job_id))
+
+    def fail(self, job_id, error, max_attempts=MAX_JOB_ATTEMPTS):
+        """Requeue a failed job until it has used up its attempts"""
+        self.conn.execute(
+            "UPDATE jobs SET status = CASE WHEN attempts < ? THEN 'queued' ELSE 'failed' END, "
+            "error = ?, updated_at = ? WHERE id = ?",
+            (max_attempts, str(error), time.time(), job_id))
+
+    def requeue_running(self, max_attempts=MAX_JOB_ATTEMPTS):
+        """
+        Handle jobs left 'running' by workers whose process is gone like
+        failed ones: requeued (to resume from their last checkpoint) until
+        they have used up their attempts, so a job that keeps killing its
+        worker ends up 'failed'. Jobs of live workers (e.g. of another
+        `work` command) are left alone. Returns the number of such jobs.
+        """
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = self.conn.execute("SELECT id, pid FROM jobs WHERE status = 'running'").fetchall()
+            orphans = [row["id"] for row in rows if not _process_alive(row["pid"])]
+            self.conn.executemany(
+                "UPDATE jobs SET status = CASE WHEN attempts < ? THEN 'queued' ELSE 'failed' END, "
+                "error = 'worker process died', worker = NULL, pid = NULL, updated_at = ? WHERE id = ?",
+                [(max_attempts, time.time(), job_id) for job_id in orphans])
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        return len(orphans)
+
+    def get(self, job_id):
+        row = self.conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def list(self, status=None, limit=100):
+        if status:
+            rows = self.conn.execute(
+                "SELECT * FROM jobs WHERE status = ? ORDER BY id DESC LIMIT ?", (status, limit))
+        else:
+            rows = self.conn.execute("SELECT * FROM jobs ORDER BY id DESC LIMIT ?", (limit,))
+        return [dict(row) for row in rows]
+
+
+def _process_alive(pid):
+    """Whether a process with this pid exists on this machine"""
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # Exists, owned by another user
+    return True
+
+
+def _checkpoint_path(workdir, stage):
+    return os.path.join(workdir, f"{stage}.json")
+
+
+def load_checkpoint(workdir, stage):
+    """The saved result of a stage, or None when it hasn't completed"""
+    path = _checkpoint_path(workdir, stage)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_checkpoint(workdir, stage, value):
+    """Write a stage result atomically, so a crash never leaves half a checkpoint"""
+    path = _checkpoint_path(workdir, stage)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(value, f)
+    os.replace(tmp_path, path)
+
+
+def run_stage(queue, job, stage, compute, is_valid=None):
+    """
+    Return a stage's checkpointed result, or compute and checkpoint it.
+    `is_valid` can reject a stale checkpoint (e.g. a video that was removed).
+    """
+    value = load_checkpoint(job["workdir"], stage)
+    if value is not None and (is_valid is None or is_valid(value)):
+        print(f"[RESUME] Job {job['id']}: {stage} already done.")
+        return value
+    value = compute()
+    if value is None:
+        return None
+    save_checkpoint(job["workdir"], stage, value)
+    queue.checkpoint(job["id"], stage)
+    return value
+
+
+def process_job(queue, job, model=None, cache=None, download_mode=DOWNLOAD_MODE):
+    """
+    Run one job's stages inside its working directory, skipping the ones
+    with a checkpoint. Raises RuntimeError when a stage produces nothing or
+    a segment fails to render.
+    """
+    url = job["url"]
+    vertical = bool(job["vertical"])
+    workdir = job["workdir"]
+    os.makedirs(workdir, exist_ok=True)
+    video_id = extract_video_id(url)
+    metrics = Metrics()
+
+    if download_mode == "sections":
+        download = {"video_file": url}
+    else:
+        with metrics.stage("download"):
+            download = run_stage(
+                queue, job, "download",
+                lambda: _video_record(fetch_video(url, video_id, cache, os.path.join(workdir, "video.mp4"))),
+                is_valid=lambda record: os.path.exists(record["video_file"]))
+        if not download:
+            raise RuntimeError("could not download the video")
+
+    with metrics.stage("transcript"):
+        transcript_data = run_stage(
+            queue, job, "transcript", lambda: fetch_transcript(url, video_id, cache))
+    if not transcript_data:
+        raise RuntimeError("transcript not found")
+
+    with metrics.stage("gpt"):
+        segments = run_stage(
+            queue, job, "segments", lambda: segment_transcript(transcript_data, cache))
+    if not segments:
+        raise RuntimeError("GPT did not return a valid segment list")
+    metrics.count("segments", len(segments))
+
+    if download_mode == "sections":
+        with metrics.stage("download"):
+            segments = run_stage(
+                queue, job, "sections",
+                lambda: download_segment_sections(url, segments, os.path.join(workdir, "sections")),
+                is_valid=lambda located: all(
+                    os.path.exists(seg["source"]) for seg in located if "source" in seg))
+        if not segments:
+            raise RuntimeError("could not download the segment sections")
+
+    def render():
+        results = cut_video_with_subtitles(
+            download["video_file"], segments, transcript_data,
+            output_folder=os.path.join(workdir, "reels"), vertical=vertical,
+            workers=1, metrics=metrics, model=model)
+        failed = [result["index"] for result in results if result["status"] == "failed"]
+        if failed:
+            # Not checkpointed: a retry renders again, reusing the finished segments (see the manifest)
+            raise RuntimeError(f"segments {failed} failed to render")
+        return [{k: v for k, v in result.items() if k != "metrics"} for result in results]
+
+    with metrics.stage("rendering"):
+        results = run_stage(queue, job, "render", render)
+    metrics.write_json(os.path.join(workdir, "metrics.json"))
+    return results
+
+
+def _video_record(video_file):
+    return {"video_file": video_file} if video_file else None
+
+
+def run_worker(name, db_path=JOB_DB_PATH, job_root=JOB_ROOT, poll_seconds=QUEUE_POLL_SECONDS,
+               use_cache=True, exit_when_idle=False):
+    """
+    Claim and process jobs until stopped (or, with exit_when_idle, until the
+    queue is empty). YOLO is loaded on the first vertical job and reused.
+    """
+    queue = JobQueue(db_path, job_root)
+    cache = Cache() if use_cache else None
+    model = None
+    print(f"[INFO] Worker {name} started.")
+    try:
+        while True:
+            job = queue.claim(name)
+            if job is None:
+                if exit_when_idle:
+                    return
+                time.sleep(poll_seconds)
+                continue
+            print(f"[STEP] Worker {name}: job {job['id']} ({job['url']}), attempt {job['attempts']}")
+            try:
+                if job["vertical"] and model is None:
+                    model = get_yolo_model()
+                process_job(queue, job, model, cache)
+                queue.finish(job["id"])
+                print(f"[DONE] Job {job['id']}: reels in {os.path.join(job['workdir'], 'reels')}")
+            except Exception as e:
+                print(f"[ERROR] Job {job['id']} failed: {e}")
+                queue.fail(job["id"], e)
+    finally:
+        queue.close()
+
+
+def start_workers(count=QUEUE_WORKERS, db_path=JOB_DB_PATH, job_root=JOB_ROOT, use_cache=True,
+                  exit_when_idle=False):
+    """Requeue (or fail) jobs whose worker died and start `count` worker processes"""
+    queue = JobQueue(db_path, job_root)
+    orphaned = queue.requeue_running()
+    queue.close()
+    if orphaned:
+        print(f"[INFO] Requeued {orphaned} interrupted jobs (or failed them if out of attempts).")
+    workers = []
+    for i in range(max(1, count)):
+        worker = Process(
+            target=run_worker,
+            args=(f"worker-{i + 1}", db_path, job_root, QUEUE_POLL_SECONDS, use_cache, exit_when_idle))
+        worker.start()
+        workers.append(worker)
+    return workers
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SQLite-backed job queue for podcast URLs.")
+    parser.add_argument("--db", default=JOB_DB_PATH, help="Queue database")
+    parser.add_argument("--jobs", default=JOB_ROOT, help="Root of the per-job working directories")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    submit = commands.add_parser("submit", help="Queue URLs")
+    submit.add_argument("urls", nargs="+")
+    submit.add_argument("--vertical", action="store_true", help="Also render the vertical reels")
+
+    work = commands.add_parser("work", help="Run worker processes")
+    work.add_argument("--workers", type=int, default=QUEUE_WORKERS)
+    work.add_argument("--no-cache", action="store_true", help="Don't use the on-disk cache")
+    work.add_argument("--exit-when-idle", action="store_true", help="Stop once the queue is empty")
+
+    status = commands.add_parser("status", help="List jobs")
+    status.add_argument("--status", choices=("queued", "running", "done", "failed"))
+
+    args = parser.parse_args()
+    if args.command == "submit":
+        queue = JobQueue(args.db, args.jobs)
+        for url in args.urls:
+            print(f"[INFO] Queued job {queue.submit(url, args.vertical)}: {url}")
+        queue.close()
+    elif args.command == "work":
+        for worker in start_workers(args.workers, args.db, args.jobs, not args.no_cache,
+                                    args.exit_when_idle):
+            worker.join()
+    else:
+        queue = JobQueue(args.db, args.jobs)
+        for job in queue.list(args.status):
+            error = f" - {job['error']}" if job["error"] else ""
+            print(f"{job['id']:>5} {job['status']:<8} {job['stage'] or '-':<10} {job['url']}{error}")
+        queue.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""
+Process many YouTube URLs with overlapping stages:
+
+    python job_runner.py URL [URL ...] --concurrency 2 --vertical
+
+Per URL the yt-dlp download runs in a thread while the transcript is
+fetched and segmented by GPT; every segment is handed to a shared render
+pool as soon as the video is on disk. At most `concurrency` URLs are in
+flight at once, so one job can download while another renders.
+"""
+import argparse
+import asyncio
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from youtube_utils import extract_video_id, download_segment_sections, DOWNLOAD_MODES
+from main import fetch_video, fetch_transcript, segment_transcript
+from video_processor import (
+    profile_output_folder,
+    resolve_render_options,
+    RenderPlan,
+    _init_render_worker,
+    _render_segment_in_worker,
+)
+from cache_utils import Cache
+from metrics import Metrics
+from ffmpeg_utils import ENCODE_PROFILES
+from config import (
+    OUTPUT_FOLDER,
+    RENDER_WORKERS,
+    JOB_CONCURRENCY,
+    CUT_MODE,
+    SUBTITLE_STYLE,
+    DOWNLOAD_MODE,
+    ENCODE_PROFILE,
+    INCREMENTAL_RENDER,
+)
+
+
+async def _timed(metrics, name, func, *args):
+    """Run a blocking call in a thread, charging its wall time to a stage"""
+    start = time.perf_counter()
+    try:
+        return await asyncio.to_thread(func, *args)
+    finally:
+        metrics.add_time(name, time.perf_counter() - start)
+
+
+async def run_job(youtube_url, pool, vertical=False, cache=None, output_folder=OUTPUT_FOLDER,
+                  cut_mode=CUT_MODE, subtitle_style=SUBTITLE_STYLE, download_mode=DOWNLOAD_MODE,
+                  encode_profile=ENCODE_PROFILE, incremental=INCREMENTAL_RENDER):
+    """
+    Turn one URL into reels under output_folder/<video_id>. The download
+    overlaps transcript fetch and segmentation (with download_mode
+    "sections" only the segments' ranges are fetched, after segmentation);
+    segments are rendered in `pool` (see make_render_pool). Returns the
+    per-segment result dicts, in segment order, or None when the job
+    failed before rendering. Draft/preview reels go to a subfolder named
+    after the encode profile. With `incremental`, segments unchanged since
+    the last run of this URL are reused (see segment_manifest.py).
+    """
+    metrics = Metrics()
+    video_id = extract_video_id(youtube_url)
+    job_folder = os.path.join(output_folder, video_id)
+    os.makedirs(job_folder, exist_ok=True)
+
+    if download_mode == "sections":
+        download = None
+    else:
+        print(f"[STEP] {video_id}: downloading while the transcript is fetched and segmented...")
+        download = asyncio.create_task(_timed(
+            metrics, "download", fetch_video, youtube_url, video_id, cache,
+            os.path.join(job_folder, "original_video.mp4")))
+    try:
+        transcript_data = await _timed(metrics, "transcript", fetch_transcript,
+                                       youtube_url, video_id, cache)
+        if not transcript_data:
+            print(f"[ERROR] {video_id}: transcript not found.")
+            return None
+        segments = await _timed(metrics, "gpt", segment_transcript, transcript_data, cache)
+        if not segments:
+            print(f"[ERROR] {video_id}: GPT did not return a valid segment list.")
+            return None
+        print(f"[INFO] {video_id}: GPT returned {len(segments)} segments.")
+        metrics.count("segments", len(segments))
+        if download is None:
+            video_file = youtube_url
+            segments = await _timed(metrics, "download", download_segment_sections,
+                                    youtube_url, segments, os.path.join(job_folder, "sections"))
+        else:
+            video_file = await download
+    finally:
+        # yt-dlp can't be interrupted from here; let a failed job's download finish quietly
+        if download is not None and not download.done():
+            await asyncio.wait([download])
+    if not video_file or not segments:
+        print(f"[ERROR] {video_id}: could not download.")
+        return None
+
+    reel_folder = profile_output_folder(job_folder, encode_profile)
+    os.makedirs(reel_folder, exist_ok=True)
+
+    def render():
+        # Runs in a thread: the plan reads the manifest and collects the pool's results
+        plan = RenderPlan(video_file, segments, transcript_data, reel_folder, vertical,
+                          cut_mode, subtitle_style, encode_profile, incremental, metrics)
+        return plan.render(lambda job, reuse: pool.submit(
+            _render_segment_in_worker, *job, cut_mode, subtitle_style, encode_profile, reuse), video_id)
+
+    results = await _timed(metrics, "rendering", render)
+    metrics.write_json(os.path.join(job_folder, "metrics.json"))
+    print(f"[DONE] {video_id}: reels written to {reel_folder}")
+    return results
+
+
+def make_render_pool(vertical, workers=None):
+    """
+    Process pool shared by every job; each worker loads YOLO once and gets
+    an equal share of the CPU cores (see video_processor._init_render_worker).
+    """
+    if workers is None:
+        workers = RENDER_WORKERS
+    workers = max(1, workers)
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_render_worker,
+        initargs=(vertical, threads),
+    )
+
+
+async def run_jobs(urls, concurrency=JOB_CONCURRENCY, vertical=False, use_cache=True,
+                   output_folder=OUTPUT_FOLDER, workers=None, cut_mode=None, subtitle_style=None,
+                   download_mode=None, encode_profile=None):
+    """
+    Process `urls` with at most `concurrency` jobs in flight. A failing job
+    is reported and doesn't stop the others. Returns {url: results or None}.
+    """
+    cut_mode, subtitle_style, encode_profile = resolve_render_options(
+        vertical, cut_mode, subtitle_style, encode_profile)
+    if download_mode is None:
+        download_mode = DOWNLOAD_MODE
+    if download_mode not in DOWNLOAD_MODES:
+        raise ValueError(f"download_mode must be one of {DOWNLOAD_MODES}, got {download_mode!r}")
+
+    cache = Cache() if use_cache else None
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    urls = list(dict.fromkeys(urls))  # The same video twice would race on its files
+
+    async def bounded(url, pool):
+        async with semaphore:
+            try:
+                return await run_job(url, pool, vertical, cache, output_folder,
+                                     cut_mode, subtitle_style, download_mode, encode_profile)
+            except Exception as e:
+                print(f"[ERROR] Job for {url} failed: {e}")
+                return None
+
+    with make_render_pool(vertical, workers) as pool:
+        results = await asyncio.gather(*(bounded(url, pool) for url in urls))
+    return dict(zip(urls, results))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Turn many YouTube videos into topic reels.")
+    parser.add_argument("urls", nargs="+", help="YouTube watch URLs")
+    parser.add_argument("--concurrency", type=int, default=JOB_CONCURRENCY,
+                        help="Videos processed at the same time")
+    parser.add_argument("--workers", type=int, default=RENDER_WORKERS,
+                        help="Render processes shared by all videos")
+    parser.add_argument("--vertical", action="store_true", help="Also render the vertical reels")
+    parser.add_argument("--no-cache", action="store_true", help="Don't use the on-disk cache")
+    parser.add_argument("--output", default=OUTPUT_FOLDER, help="Output folder (one subfolder per video)")
+    parser.add_argument("--download-mode", choices=DOWNLOAD_MODES, default=DOWNLOAD_MODE,
+                        help="Fetch the whole video or only the segments' ranges")
+    parser.add_argument("--profile", choices=tuple(ENCODE_PROFILES), default=ENCODE_PROFILE,
+                        help="Encode profile; 'preview' quickly renders small reels for review")
+    args = parser.parse_args()
+
+    results = asyncio.run(run_jobs(
+        args.urls, args.concurrency, args.vertical, not args.no_cache, args.output, args.workers,
+        download_mode=args.download_mode, encode_profile=args.profile))
+    failed = [url for url, result in results.items() if result is None]
+    for url in failed:
+        print(f"[ERROR] No reels for {url}")
+    print(f"[DONE] {len(results) - len(failed)}/{len(results)} videos processed.")
+
+
+if __name__ == "__main__":
+    main()
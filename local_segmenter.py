@@ -0,0 +1,145 @@
+"""
+Offline topic segmentation, a drop-in alternative to asking GPT.
+
+TextTiling-style: every transcript line is embedded once (in batches) with
+sentence-transformers, the similarity between the windows before and
+after each line start is measured, and boundaries go where it drops the
+deepest. The boundaries are then chosen by dynamic programming so that
+every segment lasts between SEGMENT_MIN_SECONDS and SEGMENT_MAX_SECONDS.
+"""
+import bisect
+
+import numpy as np
+
+from config import (
+    SEGMENT_EMBEDDING_MODEL,
+    SEGMENT_EMBED_BATCH_SIZE,
+    SEGMENT_MIN_SECONDS,
+    SEGMENT_MAX_SECONDS,
+)
+
+# Seconds of transcript on each side of a candidate boundary that are compared
+COMPARE_WINDOW_SECONDS = 20.0
+TOPIC_WORDS = 8
+
+_encoders = {}
+
+def load_encoder(name=SEGMENT_EMBEDDING_MODEL):
+    """Load (once per process) a sentence-transformers model"""
+    if name not in _encoders:
+        from sentence_transformers import SentenceTransformer
+        _encoders[name] = SentenceTransformer(name)
+    return _encoders[name]
+
+def embed_lines(texts, encoder, batch_size=SEGMENT_EMBED_BATCH_SIZE):
+    """Unit-length embedding per line, shape (len(texts), dim)"""
+    return encoder.encode(texts, batch_size=batch_size, convert_to_numpy=True,
+                          normalize_embeddings=True, show_progress_bar=False)
+
+def gap_similarities(embeddings, window):
+    """
+    Cosine similarity between the mean embedding of the `window` lines
+    before and after each gap; gap g sits before line g (g = 1 .. n-1).
+    """
+    n = len(embeddings)
+    csum = np.vstack([np.zeros((1, embeddings.shape[1])), np.cumsum(embeddings, axis=0)])
+    gaps = np.arange(1, n)
+    left = csum[gaps] - csum[np.maximum(gaps - window, 0)]
+    right = csum[np.minimum(gaps + window, n)] - csum[gaps]
+    left /= np.linalg.norm(left, axis=1, keepdims=True) + 1e-9
+    right /= np.linalg.norm(right, axis=1, keepdims=True) + 1e-9
+    return (left * right).sum(axis=1)
+
+def depth_scores(similarities):
+    """
+    TextTiling depth of every gap: how far the similarity lies below the
+    nearest peaks on its left and right. Deep valleys are topic shifts.
+    """
+    sims = np.asarray(similarities, dtype=float)
+    if len(sims) >= 3:  # Light smoothing so small wiggles don't count as peaks
+        sims = np.convolve(np.pad(sims, 1, mode="edge"), np.ones(3) / 3, mode="valid")
+    depths = np.zeros(len(sims))
+    for i, s in enumerate(sims):
+        left = i
+        while left > 0 and sims[left - 1] >= sims[left]:
+            left -= 1
+        right = i
+        while right < len(sims) - 1 and sims[right + 1] >= sims[right]:
+            right += 1
+        depths[i] = (sims[left] - s) + (sims[right] - s)
+    return depths
+
+def choose_boundaries(times, gains, min_seconds, max_seconds):
+    """
+    Pick the segmentation with the largest total gain in which every
+    segment is between min_seconds and max_seconds long.
+
+    times[k] is the start of line k, with the transcript end appended;
+    gains[k - 1] is the reward for a boundary before line k. Returns the
+    boundary line indices including 0 and len(times) - 1, or None when no
+    segmentation satisfies the limits.
+    """
+    n = len(times) - 1
+    best = np.full(n + 1, -np.inf)
+    prev = np.full(n + 1, -1)
+    best[0] = 0.0
+    for j in range(1, n + 1):
+        gain = 0.0 if j == n else gains[j - 1]
+        # Earlier boundaries i with min_seconds <= times[j] - times[i] <= max_seconds
+        lo = bisect.bisect_left(times, times[j] - max_seconds)
+        hi = min(bisect.bisect_right(times, times[j] - min_seconds), j)
+        if lo >= hi:
+            continue
+        i = lo + int(np.argmax(best[lo:hi]))
+        if best[i] > -np.inf:
+            best[j] = best[i] + gain
+            prev[j] = i
+    if best[n] == -np.inf:
+        return None
+    bounds = [n]
+    while bounds[-1] > 0:
+        bounds.append(int(prev[bounds[-1]]))
+    return bounds[::-1]
+
+def segment_topics(transcript_data, encoder=None, min_seconds=SEGMENT_MIN_SECONDS,
+                   max_seconds=SEGMENT_MAX_SECONDS):
+    """
+    Split the transcript into topic segments locally. Returns a list of
+    {topic, start, end} like ask_openai_for_topic_segments, or None.
+    """
+    lines = sorted((item for item in transcript_data if item["text"].strip()),
+                   key=lambda item: item["start"])
+    if not lines:
+        return None
+    if encoder is None:
+        encoder = load_encoder()
+
+    texts = [item["text"].replace("\n", " ").strip() for item in lines]
+    starts = [float(item["start"]) for item in lines]
+    end_time = max(float(item["start"]) + float(item.get("duration", 0.0)) for item in lines)
+    times = starts + [max(end_time, starts[-1])]
+
+    embeddings = embed_lines(texts, encoder)
+    line_seconds = float(np.median(np.diff(times))) if len(times) > 1 else 0.0
+    window = max(2, int(round(COMPARE_WINDOW_SECONDS / max(line_seconds, 1e-3))))
+    if len(lines) > 1:
+        depths = depth_scores(gap_similarities(embeddings, window))
+        # TextTiling cutoff: valleys shallower than mean - std/2 aren't topic shifts
+        gains = depths - (depths.mean() - depths.std() / 2)
+    else:
+        gains = np.zeros(0)
+
+    # Long pauses can make max_seconds unsatisfiable; a transcript shorter
+    # than min_seconds becomes a single segment
+    bounds = (choose_boundaries(times, gains, min_seconds, max_seconds)
+              or choose_boundaries(times, gains, min_seconds, np.inf)
+              or [0, len(lines)])
+
+    segments = []
+    for i, j in zip(bounds, bounds[1:]):
+        # Label with the first words of the line closest to the segment's centroid
+        centroid = embeddings[i:j].mean(axis=0)
+        central = i + int(np.argmax(embeddings[i:j] @ centroid))
+        topic = " ".join(texts[central].split()[:TOPIC_WORDS])
+        segments.append({"topic": topic, "start": times[i], "end": times[j]})
+    return segments
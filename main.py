@@ -1,56 +1,205 @@
-import nltk
+import argparse
+import os
 
-from youtube_utils import download_youtube_video, get_transcript
+from youtube_utils import (
+    download_youtube_video,
+    get_transcript,
+    extract_video_id,
+    download_segment_sections,
+    DOWNLOAD_MODES,
+)
 from gpt_utils import (
     create_single_string_from_transcript,
     ask_openai_for_topic_segments,
-    parse_gpt_segments
+    parse_gpt_segments,
+    SEGMENT_MODEL,
+    SYSTEM_PROMPT,
+)
+from config import (
+    SEGMENT_WINDOW_TOKENS,
+    METRICS_PATH,
+    OUTPUT_FOLDER,
+    DOWNLOAD_MODE,
+    SEGMENTATION_BACKEND,
+    SEGMENT_EMBEDDING_MODEL,
+    SEGMENT_MIN_SECONDS,
+    SEGMENT_MAX_SECONDS,
 )
 from video_processor import cut_video_with_subtitles
+from cache_utils import STAGES, Cache, make_key, cached_download, cached_json
+from metrics import Metrics
+
+
+# Topic segmentation backends selectable with SEGMENTATION_BACKEND
+SEGMENTATION_BACKENDS = ("gpt", "local")
+
+
+def segment_transcript(transcript_data, cache=None, backend=None):
+    """
+    Split the transcript into topic segments (cached when `cache` is given)
+    with GPT or, with backend "local", sentence embeddings on this machine.
+    Returns the parsed segment list, or None.
+    """
+    if backend is None:
+        backend = SEGMENTATION_BACKEND
+    if backend not in SEGMENTATION_BACKENDS:
+        raise ValueError(f"backend must be one of {SEGMENTATION_BACKENDS}, got {backend!r}")
+    if backend == "local":
+        from local_segmenter import segment_topics
+        compute = lambda: segment_topics(transcript_data)
+        if cache:
+            gpt_segments = cached_json(
+                cache, "segments", make_key("segments", "local", transcript_data, SEGMENT_EMBEDDING_MODEL,
+                                             SEGMENT_MIN_SECONDS, SEGMENT_MAX_SECONDS),
+                compute)
+        else:
+            gpt_segments = compute()
+        return parse_gpt_segments(gpt_segments) if gpt_segments else None
+
+    transcript_str = create_single_string_from_transcript(transcript_data)
+    if cache:
+        gpt_segments = cached_json(
+            cache, "segments", make_key("segments", transcript_str, SEGMENT_MODEL, SYSTEM_PROMPT,
+                                         SEGMENT_WINDOW_TOKENS),
+            lambda: ask_openai_for_topic_segments(transcript_str))
+    else:
+        gpt_segments = ask_openai_for_topic_segments(transcript_str)
+    if not gpt_segments:
+        return None
+    return parse_gpt_segments(gpt_segments)
+
+
+def fetch_video(youtube_url, video_id, cache=None, output_path="original_video.mp4"):
+    """Download the video (through the cache when given). Returns its path, or None."""
+    if cache:
+        return cached_download(cache, video_id, youtube_url, download_youtube_video)
+    return download_youtube_video(youtube_url, output_path)
+
+
+def fetch_transcript(youtube_url, video_id, cache=None):
+    """Fetch the YouTube transcript (through the cache when given), or None."""
+    if cache:
+        return cached_json(cache, "transcript", make_key("transcript", video_id),
+                           lambda: get_transcript(youtube_url))
+    return get_transcript(youtube_url)
+
+
+def run_pipeline(video_file, transcript_data, output_folder=OUTPUT_FOLDER, vertical=False,
+                 cache=None, metrics=None, model=None, download_mode="full", encode_profile=None):
+    """
+    Segment a transcript and render the reels for an already available video.
+    Returns the per-segment results of cut_video_with_subtitles, or None.
+    A loaded YOLO `model` is reused for the vertical reels when given.
+
+    With download_mode "sections", `video_file` is only the source (a URL,
+    or a local file standing in for one) and just the segments' time ranges
+    are fetched from it once segmentation is done. encode_profile picks the
+    ffmpeg settings (see ffmpeg_utils.ENCODE_PROFILES); "preview" renders
+    small reels for review.
+    """
+    if metrics is None:
+        metrics = Metrics()
 
+    print(f"[INFO] Transcript has {len(transcript_data)} lines.")
+    print(f"[STEP] Segmenting the transcript into topics ({SEGMENTATION_BACKEND}).")
+    with metrics.stage("gpt"):
+        segments = segment_transcript(transcript_data, cache)
+    if not segments:
+        print("[ERROR] GPT did not return a valid segment list. Exiting.")
+        return None
+
+    print(f"[INFO] GPT returned {len(segments)} segments.")
+    metrics.count("segments", len(segments))
+
+    if download_mode == "sections":
+        print("[STEP] Downloading only the segments' time ranges...")
+        with metrics.stage("download"):
+            segments = download_segment_sections(
+                video_file, segments, os.path.join(output_folder, "sections"))
+        if not segments:
+            print("[ERROR] Could not download the segment sections. Exiting.")
+            return None
 
-def main(youtube_url, vertical=False):
+    print("[STEP] Cutting the video into topic segments with 'TikTokFunky' subtitles.")
+    with metrics.stage("rendering"):
+        return cut_video_with_subtitles(
+            video_file,
+            segments,
+            transcript_data,
+            output_folder=output_folder,
+            vertical=vertical,
+            metrics=metrics,
+            model=model,
+            encode_profile=encode_profile,
+        )
+
+
+def main(youtube_url, vertical=False, use_cache=True, invalidate=(), metrics_path=METRICS_PATH,
+         output_folder=OUTPUT_FOLDER, download_path="original_video.mp4", download_mode=DOWNLOAD_MODE,
+         encode_profile=None):
     """
     Main function to process a YouTube video into topic-segmented reels.
+
+    Downloads, transcripts and GPT segmentations are cached on disk (see
+    cache_utils), so a rerun skips straight to rendering. Pass stage names
+    in `invalidate` ("download", "transcript", "segments") to recompute them.
+    Per-stage timings are written as JSON to `metrics_path`. Reels go to
+    `output_folder`; without the cache the video is downloaded to
+    `download_path`. With download_mode "sections" the video isn't
+    downloaded up front; only the segments' ranges are fetched after
+    segmentation.
+
+    Stages run one after another; see job_runner for many URLs with the
+    download overlapping transcript fetch and segmentation, and job_queue
+    for a persistent queue served by worker processes.
     """
-    print("[STEP] Downloading the YouTube video...")
-    video_file = download_youtube_video(youtube_url, "original_video.mp4")
-    if not video_file:
-        print("[ERROR] Could not download. Exiting.")
-        return
+    if download_mode not in DOWNLOAD_MODES:
+        raise ValueError(f"download_mode must be one of {DOWNLOAD_MODES}, got {download_mode!r}")
+    metrics = Metrics()
+    cache = Cache() if use_cache else None
+    for stage in invalidate:
+        if cache:
+            cache.invalidate(stage)
+    video_id = extract_video_id(youtube_url)
+
+    if download_mode == "sections":
+        video_file = youtube_url
+    else:
+        print("[STEP] Downloading the YouTube video...")
+        with metrics.stage("download"):
+            video_file = fetch_video(youtube_url, video_id, cache, download_path)
+        if not video_file:
+            print("[ERROR] Could not download. Exiting.")
+            return
 
     print("[STEP] Fetching transcript from YouTube...")
-    transcript_data = get_transcript(youtube_url)
+    with metrics.stage("transcript"):
+        transcript_data = fetch_transcript(youtube_url, video_id, cache)
     if not transcript_data:
         print("[ERROR] Transcript not found. Exiting.")
         return
 
-    print(f"[INFO] Transcript has {len(transcript_data)} lines.")
-    transcript_str = create_single_string_from_transcript(transcript_data)
+    results = run_pipeline(video_file, transcript_data, output_folder, vertical, cache, metrics,
+                           download_mode=download_mode, encode_profile=encode_profile)
 
-    print("[STEP] Asking OpenAI to produce topic segments with start/end from the transcript.")
-    gpt_segments = ask_openai_for_topic_segments(transcript_str)
-    if not gpt_segments:
-        print("[ERROR] GPT did not return a valid segment list. Exiting.")
+    if metrics_path:
+        metrics.write_json(metrics_path)
+        print(f"[INFO] Stage timings written to {metrics_path}")
+    if results is None:
         return
 
-    segments = parse_gpt_segments(gpt_segments)
-    print(f"[INFO] GPT returned {len(segments)} segments.")
-
-    print("[STEP] Cutting the video into topic segments with 'TikTokFunky' subtitles.")
-    cut_video_with_subtitles(
-        video_file,
-        segments,
-        transcript_data,
-        output_folder="topic_segments",
-        vertical=vertical,
-    )
-
-    print("[DONE] Check the 'topic_segments' folder for your final funky subtitled clips.")
+    print(f"[DONE] Check the '{output_folder}' folder for your final funky subtitled clips.")
+    return results
 
 
 if __name__ == "__main__":
     # Example usage:
     TEST_URL = "https://www.youtube.com/watch?v=Ff4fRgnuFgQ"
+    parser = argparse.ArgumentParser(description="Turn a YouTube podcast into topic reels.")
+    parser.add_argument("url", nargs="?", default=TEST_URL, help="YouTube watch URL")
+    parser.add_argument("--invalidate", action="append", choices=STAGES, default=[],
+                        help="Recompute this cached stage (repeatable)")
+    args = parser.parse_args()
+    import nltk  # Only the script needs it; importing main stays cheap
     nltk.download('punkt')  # Ensure NLTK data is available
-    main(TEST_URL, vertical=True)
+    main(args.url, vertical=True, invalidate=tuple(args.invalidate))
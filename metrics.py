@@ -0,0 +1,93 @@
+import json
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process (and of its waited-for children) in MB"""
+    if resource is None:
+        return None
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux
+    return round(max(own, children) / 1024, 1)
+
+
+class Metrics:
+    """
+    Wall-clock time per pipeline stage plus counters for one run. Metrics of
+    sub-tasks (e.g. segments rendered in worker processes) are combined with
+    merge(): times and counters add up, peak memory takes the maximum.
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self.counters = {}
+        self.peak_rss_mb = None
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def add_time(self, name, seconds):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def sample_memory(self):
+        rss = peak_rss_mb()
+        if rss is not None:
+            self.peak_rss_mb = max(self.peak_rss_mb or 0.0, rss)
+
+    def merge(self, other):
+        """Add another Metrics (or its to_dict()) into this one"""
+        if isinstance(other, Metrics):
+            other = other.to_dict()
+        for name, seconds in other.get("stages", {}).items():
+            self.add_time(name, seconds)
+        for name, n in other.get("counters", {}).items():
+            self.count(name, n)
+        rss = other.get("peak_rss_mb")
+        if rss is not None:
+            self.peak_rss_mb = max(self.peak_rss_mb or 0.0, rss)
+
+    def to_dict(self):
+        self.sample_memory()
+        data = {
+            "stages": {name: round(seconds, 4) for name, seconds in self.stages.items()},
+            "counters": dict(self.counters),
+            "peak_rss_mb": self.peak_rss_mb,
+        }
+        frames = self.counters.get("frames", 0)
+        render_time = self.stages.get("render", 0.0)
+        if frames and render_time:
+            data["frames_per_s"] = round(frames / render_time, 2)
+        return data
+
+    def write_json(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+
+def timed_iter(iterable, metrics, name):
+    """Yield from iterable, charging the time spent producing each item to a stage"""
+    it = iter(iterable)
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(it)
+        except StopIteration:
+            metrics.add_time(name, time.perf_counter() - start)
+            return
+        metrics.add_time(name, time.perf_counter() - start)
+        yield item
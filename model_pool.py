@@ -0,0 +1,42 @@
+"""
+Process-wide pool of the expensive objects the pipeline reuses.
+
+The YOLO model (torch + ultralytics) and the OpenAI client are created on
+first use and then shared by every segment, job and thread of the process,
+so importing the pipeline stays cheap and only the first segment that
+needs a model pays for loading it. Pool workers warm the pool once in
+their initializer (see video_processor._init_render_worker).
+"""
+import threading
+
+from config import OPENAI_API_KEY, OPENAI_BASE_URL
+
+DEFAULT_WEIGHTS = "yolov8n.pt"
+
+_lock = threading.Lock()
+_yolo_models = {}
+_openai_client = None
+
+
+def get_yolo_model(weights=DEFAULT_WEIGHTS):
+    """The YOLO model for `weights`, loaded once per process"""
+    model = _yolo_models.get(weights)
+    if model is None:
+        with _lock:
+            model = _yolo_models.get(weights)
+            if model is None:
+                from ultralytics import YOLO
+                model = _yolo_models[weights] = YOLO(weights)
+    return model
+
+
+def get_openai_client():
+    """The synchronous OpenAI client, created once per process"""
+    global _openai_client
+    if _openai_client is None:
+        with _lock:
+            if _openai_client is None:
+                import openai
+                _openai_client = openai.OpenAI(api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL)
+    return _openai_client
+
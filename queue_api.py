@@ -0,0 +1,58 @@
+"""
+HTTP front end for the job queue:
+
+    uvicorn queue_api:app
+    python job_queue.py work --workers 2
+
+POST /jobs queues a URL, GET /jobs/{id} reports its status and last
+completed stage. Rendering happens in the job_queue workers, not here.
+"""
+from fastapi import FastAPI, HTTPException
+from pydantic import BaseModel
+
+from job_queue import JobQueue
+
+app = FastAPI(title="podcast2reels queue")
+
+
+class JobRequest(BaseModel):
+    url: str
+    vertical: bool = False
+
+
+def _open_queue():
+    # One connection per request: sqlite3 connections can't cross threads
+    return JobQueue()
+
+
+@app.post("/jobs", status_code=201)
+def submit_job(request: JobRequest):
+    queue = _open_queue()
+    try:
+        job_id = queue.submit(request.url, request.vertical)
+        return queue.get(job_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        queue.close()
+
+
+@app.get("/jobs")
+def list_jobs(status: str = None, limit: int = 100):
+    queue = _open_queue()
+    try:
+        return queue.list(status, limit)
+    finally:
+        queue.close()
+
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: int):
+    queue = _open_queue()
+    try:
+        job = queue.get(job_id)
+    finally:
+        queue.close()
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
@@ -0,0 +1,178 @@
+"""
+Per-episode manifest of rendered segments, for incremental re-renders.
+
+manifest.json in a reel folder records, for every segment, the outputs it
+produced and a content key of the inputs of each of them:
+
+    cut       - the chunk: boundaries, source file, cut mode, encode profile,
+                whether a vertical reel is cropped from it (sets its height)
+    subtitles - the .ass file: boundaries, transcript slice, subtitle style
+    analysis  - the vertical crop path: the chunk plus the camera settings
+    reel      - the vertical reel: chunk, subtitles, crop path, render mode
+
+A rerun computes the same keys for each new segment and only redoes the
+parts whose key changed (or whose output is gone), so e.g. a new subtitle
+style rewrites the subtitles and burns them in again without re-cutting
+or re-running YOLO. Entries of segments that no longer exist are dropped
+together with their outputs.
+"""
+import json
+import os
+import time
+
+from cache_utils import make_key
+from config import (
+    CAMERA_MODE,
+    CAMERA_SMOOTHING_SECONDS,
+    CAMERA_MAX_SPEED,
+    SPEAKER_SWITCH_MARGIN,
+    SPEAKER_MIN_HOLD_SECONDS,
+    DETECTION_STRIDE,
+    DETECTION_BATCH_SIZE,
+    DETECTION_IMGSZ,
+    DETECTION_ROI,
+    REEL_RENDER,
+)
+
+MANIFEST_NAME = "manifest.json"
+# Bytes hashed at each end of a source file (see source_fingerprint)
+SOURCE_SAMPLE_BYTES = 1 << 20
+# Output of each part of a segment's render (keys of video_processor.segment_paths)
+PART_OUTPUTS = {"cut": "chunk", "subtitles": "ass", "analysis": "crop", "reel": "centered"}
+
+_fingerprints = {}
+
+def source_fingerprint(path, sample_bytes=SOURCE_SAMPLE_BYTES):
+    """
+    Cheap content hash of a media file: its size plus its first and last
+    sample_bytes. A re-download of the same video keeps its fingerprint,
+    a different file gets a new one. Paths that aren't files (URLs) are
+    returned as they are.
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return path
+    memo_key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    if memo_key not in _fingerprints:
+        with open(path, "rb") as f:
+            head = f.read(sample_bytes)
+            f.seek(max(0, st.st_size - sample_bytes))
+            tail = f.read(sample_bytes)
+        _fingerprints[memo_key] = make_key(st.st_size, head, tail)
+    return _fingerprints[memo_key]
+
+def segment_inputs(seg, lines, video_path, vertical, cut_mode, subtitle_style, encode_profile):
+    """
+    Everything a segment's outputs depend on. Returns (inputs, keys): the
+    JSON-serializable inputs and the content key of each part (see
+    PART_OUTPUTS; "analysis" and "reel" only when vertical).
+    """
+    inputs = {
+        "start": seg["start"],
+        "end": seg["end"],
+        "topic": seg["topic"],
+        "transcript": make_key(lines),
+        "source": source_fingerprint(seg.get("source", video_path)),
+        "offset": seg.get("offset", 0.0),
+        "cut_mode": cut_mode,
+        "subtitle_style": subtitle_style,
+        "encode_profile": encode_profile,
+        "vertical": vertical,
+    }
+    keys = {
+        "cut": make_key("cut", inputs["start"], inputs["end"], inputs["source"], inputs["offset"],
+                        cut_mode, encode_profile, vertical),
+        "subtitles": make_key("subtitles", inputs["start"], inputs["end"], inputs["transcript"],
+                              subtitle_style),
+    }
+    if vertical:
+        inputs["camera"] = {
+            "mode": CAMERA_MODE,
+            "smoothing_seconds": CAMERA_SMOOTHING_SECONDS,
+            "max_speed": CAMERA_MAX_SPEED,
+            "speaker_switch_margin": SPEAKER_SWITCH_MARGIN,
+            "speaker_min_hold_seconds": SPEAKER_MIN_HOLD_SECONDS,
+            "detection": [DETECTION_STRIDE, DETECTION_BATCH_SIZE, DETECTION_IMGSZ, DETECTION_ROI],
+        }
+        inputs["reel_render"] = REEL_RENDER
+        keys["analysis"] = make_key("analysis", keys["cut"], inputs["camera"])
+        keys["reel"] = make_key("reel", keys["cut"], keys["subtitles"], keys["analysis"],
+                                REEL_RENDER, encode_profile)
+    return inputs, keys
+
+
+class SegmentManifest:
+    """
+    The manifest of one output folder, with one entry per segment (named
+    after its chunk). Output paths are stored relative to the folder; every
+    change is saved atomically right away, so an interrupted render keeps
+    the segments finished so far.
+    """
+
+    def __init__(self, output_folder):
+        self.output_folder = output_folder
+        self.path = os.path.join(output_folder, MANIFEST_NAME)
+        self.segments = {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.segments = json.load(f)["segments"]
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError) as e:
+            print(f"[WARN] Ignoring unreadable manifest {self.path}: {e}")
+
+    def _abspath(self, name):
+        return os.path.abspath(os.path.join(self.output_folder, name))
+
+    def _name(self, paths):
+        return os.path.relpath(paths["chunk"], self.output_folder)
+
+    def up_to_date(self, paths, keys):
+        """The parts of a segment whose recorded key matches `keys` and whose output still exists"""
+        entry = self.segments.get(self._name(paths))
+        if entry is None:
+            return set()
+        parts = set()
+        for part, key in keys.items():
+            name = entry["outputs"].get(PART_OUTPUTS[part])
+            if entry["keys"].get(part) != key or name is None:
+                continue
+            path = self._abspath(name)
+            if os.path.exists(path) and os.path.getsize(path) > 0:
+                parts.add(part)
+        return parts
+
+    def record(self, paths, inputs, keys):
+        """Remember a successfully rendered segment (`paths` as from segment_paths)"""
+        self.segments[self._name(paths)] = {
+            "inputs": inputs,
+            "keys": keys,
+            "outputs": {PART_OUTPUTS[part]: os.path.relpath(paths[PART_OUTPUTS[part]], self.output_folder)
+                        for part in keys},
+            "rendered_at": time.time(),
+        }
+        self.save()
+
+    def prune(self, keep):
+        """
+        Drop the entries of segments whose `paths` aren't in `keep` and
+        delete their outputs. Returns the number of dropped entries.
+        """
+        kept = {self._name(paths) for paths in keep}
+        stale = [name for name in self.segments if name not in kept]
+        for name in stale:
+            for output in self.segments.pop(name)["outputs"].values():
+                path = self._abspath(output)
+                if os.path.exists(path):
+                    os.remove(path)
+        if stale:
+            print(f"[INFO] Removed the outputs of {len(stale)} segments that no longer exist.")
+            self.save()
+        return len(stale)
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"segments": self.segments}, f, indent=2)
+        os.replace(tmp_path, self.path)
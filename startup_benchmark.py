@@ -0,0 +1,119 @@
+"""
+Startup benchmark: what importing the pipeline and the first segment cost.
+
+Measures, each in a fresh interpreter, how long importing the pipeline's
+entry modules takes, then renders a few short synthetic segments in this
+process (segmenting each one through the stub OpenAI server, see
+benchmark.py) and compares the first, cold segment - which loads YOLO and
+creates the OpenAI client - with the warm ones that reuse them from
+model_pool. Writes the report as JSON.
+
+    python startup_benchmark.py --segments 4 --vertical --out startup.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmark import make_synthetic_video, make_synthetic_transcript, start_stub_openai_server
+
+# Entry modules whose import time is reported, cheapest first
+IMPORT_MODULES = ("gpt_utils", "video_processor", "main", "center_yolo")
+
+
+def import_seconds(module):
+    """Wall time of `import module` in a new interpreter"""
+    code = ("import time; t = time.perf_counter(); "
+            f"import {module}; print(time.perf_counter() - t)")
+    proc = subprocess.run([sys.executable, "-c", code], cwd=os.path.dirname(os.path.abspath(__file__)),
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    if proc.returncode != 0:
+        print(f"[WARN] Could not import {module}: {proc.stderr.strip().splitlines()[-1:]}")
+        return None
+    return round(float(proc.stdout.strip().splitlines()[-1]), 3)
+
+
+def _timed_call(func, *args, **kwargs):
+    start = time.perf_counter()
+    value = func(*args, **kwargs)
+    return value, time.perf_counter() - start
+
+
+def run_startup_benchmark(segments, vertical, workdir, segment_seconds=4.0):
+    report = {"imports": {module: import_seconds(module) for module in IMPORT_MODULES}}
+
+    server, base_url = start_stub_openai_server()
+    # config reads these at import time, so set them before importing the pipeline
+    os.environ["OPENAI_BASE_URL"] = base_url
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+    try:
+        import model_pool
+        from gpt_utils import ask_openai_for_topic_segments, create_single_string_from_transcript
+        from video_processor import TranscriptIndex, render_segment
+
+        duration = segments * segment_seconds
+        video_file = make_synthetic_video(os.path.join(workdir, "synthetic.mp4"), duration)
+        transcript_index = TranscriptIndex(make_synthetic_transcript(duration, line_seconds=1.0))
+        output_folder = os.path.join(workdir, "segments")
+        os.makedirs(output_folder, exist_ok=True)
+
+        timings = []
+        for i in range(segments):
+            seg = {"topic": f"segment {i + 1}", "start": i * segment_seconds,
+                   "end": (i + 1) * segment_seconds}
+            lines = transcript_index.slice(seg["start"], seg["end"])
+            start = time.perf_counter()
+            _, client_seconds = _timed_call(model_pool.get_openai_client)
+            ask_openai_for_topic_segments(create_single_string_from_transcript(lines))
+            model_seconds = 0.0
+            if vertical:
+                _, model_seconds = _timed_call(model_pool.get_yolo_model)
+            result = render_segment(i + 1, seg, video_file, lines, output_folder, vertical)
+            timings.append({
+                "segment_s": time.perf_counter() - start,
+                "client_s": client_seconds,
+                "model_s": model_seconds,
+                "status": result["status"],
+            })
+    finally:
+        server.shutdown()
+
+    failed = [i + 1 for i, t in enumerate(timings) if t["status"] != "ok"]
+    if failed:
+        raise RuntimeError(f"segments {failed} failed to render, the timings would not include rendering")
+
+    cold, warm = timings[0], timings[1:]
+
+    def mean(key):
+        return round(sum(t[key] for t in warm) / len(warm), 3) if warm else None
+
+    report["segments"] = segments
+    report["vertical"] = vertical
+    report["cold"] = {key: round(cold[key], 3) for key in ("segment_s", "client_s", "model_s")}
+    report["warm"] = {key: mean(key) for key in ("segment_s", "client_s", "model_s")}
+    if warm:
+        report["cold_overhead_s"] = round(cold["segment_s"] - report["warm"]["segment_s"], 3)
+    report["segments_ok"] = sum(1 for t in timings if t["status"] == "ok")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure import time and cold vs warm per-segment overhead.")
+    parser.add_argument("--segments", type=int, default=4, help="Synthetic segments to render (at least 2)")
+    parser.add_argument("--vertical", action="store_true", help="Also render the vertical reels (loads YOLO)")
+    parser.add_argument("--out", default="startup.json", help="Where to write the JSON report")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        report = run_startup_benchmark(max(2, args.segments), args.vertical, workdir)
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+import re
+
+import numpy as np
+
+# Subtitle styles understood by generate_ass_subtitles_for_chunk:
+#   lines   - whole transcript lines with a fade (TikTokFunky)
+#   karaoke - whole lines with per-word \k highlighting
+#   popon   - small groups of words popping on as they are spoken
+SUBTITLE_STYLES = ("lines", "karaoke", "popon")
+
+# Words shown together in "popon" mode
+WORDS_PER_GROUP = 3
+
+WORD_ASS_HEADER = """[Script Info]
+ScriptType: v4.00+
+PlayResX: 1280
+PlayResY: 720
+Title: TikTok-Style Word Subtitles
+ScaledBorderAndShadow: yes
+
+[V4+ Styles]
+Format: Name,Fontname,Fontsize,PrimaryColour,SecondaryColour,OutlineColour,BackColour,Bold,Italic,Underline,StrikeOut,ScaleX,ScaleY,Spacing,Angle,BorderStyle,Outline,Shadow,Alignment,MarginL,MarginR,MarginV,Encoding
+Style: TikTokKaraoke,Comic Sans MS,60,&H0000FFFF,&H00FFFFFF,&H00000000,&H00000000,1,0,0,0,100,100,0,0,1,3,1,5,10,10,30,0
+Style: TikTokPop,Comic Sans MS,72,&H00FFB7FF,&H00FFFFFF,&H00000000,&H00000000,1,0,0,0,100,100,0,0,1,4,1,5,10,10,30,0
+
+[Events]
+Format: Layer,Start,End,Style,Name,MarginL,MarginR,MarginV,Effect,Text
+"""
+
+_VOWEL_GROUPS = re.compile(r"[aeiouy]+", re.IGNORECASE)
+
+
+def _word_weight(word):
+    """Relative spoken length of a word: its syllable estimate, at least 1"""
+    return max(1, len(_VOWEL_GROUPS.findall(word)))
+
+
+def word_timings(lines):
+    """
+    Split transcript lines into words and spread each line's duration over
+    its words in proportion to their estimated syllables.
+    Returns (words, line_idx, starts, ends) with NumPy arrays for the last three.
+    """
+    words = []
+    counts = []
+    for item in lines:
+        line_words = item["text"].replace("\n", " ").split()
+        words.extend(line_words)
+        counts.append(len(line_words))
+    if not words:
+        empty = np.zeros(0)
+        return words, empty.astype(int), empty, empty
+
+    counts = np.array(counts)
+    line_starts = np.array([item["start"] for item in lines], dtype=float)
+    line_durations = np.array([item["duration"] for item in lines], dtype=float)
+    weights = np.array([_word_weight(w) for w in words], dtype=float)
+
+    line_idx = np.repeat(np.arange(len(lines)), counts)
+    line_totals = np.bincount(line_idx, weights=weights, minlength=len(lines))
+    cum = np.cumsum(weights)
+    # Cumulative weight at the start of each line, then within the line
+    line_offsets = np.concatenate(([0.0], np.cumsum(line_totals)[:-1]))
+    within = cum - line_offsets[line_idx]
+
+    scale = line_durations[line_idx] / line_totals[line_idx]
+    ends = line_starts[line_idx] + within * scale
+    starts = ends - weights * scale
+    return words, line_idx, starts, ends
+
+
+def ass_timestamps(seconds):
+    """Format an array of (chunk-relative) seconds as ASS H:MM:SS.cc strings"""
+    cs = np.rint(np.maximum(seconds, 0) * 100).astype(np.int64)
+    hours, rest = np.divmod(cs, 360000)
+    minutes, rest = np.divmod(rest, 6000)
+    secs, centis = np.divmod(rest, 100)
+    return [
+        f"{h:01d}:{m:02d}:{s:02d}.{c:02d}"
+        for h, m, s, c in zip(hours.tolist(), minutes.tolist(), secs.tolist(), centis.tolist())
+    ]
+
+
+def _clean(word):
+    return word.replace(",", "，").replace("{", "(").replace("}", ")")
+
+
+def _karaoke_events(words, line_idx, starts, ends, chunk_start):
+    """One event per line; each word carries its \\k duration in centiseconds"""
+    # Round the cumulative times, not each word, so durations don't drift
+    cs = np.rint((ends - chunk_start) * 100).astype(np.int64)
+    boundaries = np.flatnonzero(np.diff(line_idx)) + 1
+    for group in np.split(np.arange(len(words)), boundaries):
+        first, last = group[0], group[-1]
+        line_start_cs = int(np.rint((starts[first] - chunk_start) * 100))
+        k = np.diff(np.concatenate(([line_start_cs], cs[group])))
+        text = " ".join(f"{{\\k{int(d)}}}{_clean(words[i])}" for i, d in zip(group.tolist(), k.tolist()))
+        yield starts[first], ends[last], "TikTokKaraoke", text
+
+
+def _popon_events(words, line_idx, starts, ends, chunk_start, group_size=WORDS_PER_GROUP):
+    """Groups of words (never spanning two lines) shown while they are spoken"""
+    boundaries = np.flatnonzero(np.diff(line_idx)) + 1
+    for line in np.split(np.arange(len(words)), boundaries):
+        for g in range(0, len(line), group_size):
+            group = line[g:g + group_size]
+            text = " ".join(_clean(words[i]) for i in group.tolist())
+            text = "{\\fscx120\\fscy120\\t(0,120,\\fscx100\\fscy100)}" + text
+            yield starts[group[0]], ends[group[-1]], "TikTokPop", text
+
+
+def write_word_subtitles(lines, chunk_start, chunk_end, output_ass_path, style="karaoke"):
+    """
+    Write word-level subtitles for the transcript `lines` of one chunk.
+    Word timings and event timestamps are computed for the whole chunk at
+    once with NumPy, so the chunk's events are collected before writing.
+    """
+    if style not in ("karaoke", "popon"):
+        raise ValueError(f"Unsupported word subtitle style: {style}")
+    words, line_idx, starts, ends = word_timings(lines)
+
+    with open(output_ass_path, "w", encoding="utf-8") as f:
+        f.write(WORD_ASS_HEADER)
+        if not words:
+            return
+
+        # Drop words outside the chunk and clamp the rest to it
+        keep = (starts < chunk_end) & (ends > chunk_start)
+        if not keep.any():
+            return
+        words = [w for w, k in zip(words, keep.tolist()) if k]
+        line_idx = line_idx[keep]
+        starts = np.clip(starts[keep], chunk_start, chunk_end)
+        ends = np.clip(ends[keep], chunk_start, chunk_end)
+
+        if style == "karaoke":
+            events = _karaoke_events(words, line_idx, starts, ends, chunk_start)
+        else:
+            events = _popon_events(words, line_idx, starts, ends, chunk_start)
+
+        events = list(events)
+        times = np.array([(ev[0], ev[1]) for ev in events]).ravel() - chunk_start
+        stamps = ass_timestamps(times)
+        for i, (_, _, ev_style, text) in enumerate(events):
+            f.write(f"Dialogue: 0,{stamps[2 * i]},{stamps[2 * i + 1]},{ev_style},,0,0,0,,{text}\n")
@@ -1,26 +1,17 @@
+import bisect
 import os
 import subprocess
-from center_yolo import process_video_with_stabilization
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
 
-def generate_ass_subtitles_for_chunk(subtitle_lines, chunk_start, chunk_end, output_ass_path):
-    """
-    Generate an .ass file with a custom style "TikTokFunky":
-      - Big, bold, centered in the middle of the screen
-      - We'll use \fad(500,500) on each line for a simple fade in/out
-    """
-    def to_ass_time(sec):
-        # Convert absolute time to chunk-relative
-        rel = sec - chunk_start
-        if rel < 0:
-            rel = 0
-        hours = int(rel // 3600)
-        minutes = int((rel % 3600) // 60)
-        seconds = int(rel % 60)
-        centisec = int(round((rel - int(rel)) * 100))
-        return f"{hours:01d}:{minutes:02d}:{seconds:02d}.{centisec:02d}"
-
-    # .ass header + style definition
-    ass_header = """[Script Info]
+from ffmpeg_utils import resolve_cut_mode, ENCODE_PROFILES, build_cut_command, build_single_pass_cut_command
+from metrics import Metrics
+from model_pool import get_yolo_model
+from segment_manifest import SegmentManifest, segment_inputs
+from subtitle_utils import SUBTITLE_STYLES, write_word_subtitles
+from config import RENDER_WORKERS, CUT_MODE, SUBTITLE_STYLE, ENCODE_PROFILE, INCREMENTAL_RENDER
+
+# .ass header + style definition, shared by every segment
+ASS_HEADER = """[Script Info]
 ScriptType: v4.00+
 PlayResX: 1280
 PlayResY: 720
@@ -35,6 +26,65 @@ Style: TikTokFunky,Comic Sans MS,60,&H00FFB7FF,&H00000000,&H00000000,1,0,0,0,100
 Format: Layer,Start,End,Style,Name,MarginL,MarginR,MarginV,Effect,Text
 """
 
+class TranscriptIndex:
+    """
+    Transcript lines sorted by start time, built once per video, so the
+    lines overlapping a segment are found with two binary searches instead
+    of a scan over the whole transcript.
+    """
+
+    def __init__(self, transcript_data):
+        self.lines = sorted(transcript_data, key=lambda item: item["start"])
+        self.starts = [item["start"] for item in self.lines]
+        # Running max of end times: non-decreasing, so it can be bisected too
+        self.max_ends = []
+        max_end = float("-inf")
+        for item in self.lines:
+            max_end = max(max_end, item["start"] + item["duration"])
+            self.max_ends.append(max_end)
+
+    def __len__(self):
+        return len(self.lines)
+
+    def slice(self, chunk_start, chunk_end):
+        """Lines overlapping [chunk_start, chunk_end)"""
+        # Every line before lo ends at or before chunk_start
+        lo = bisect.bisect_right(self.max_ends, chunk_start)
+        # Every line from hi on starts at or after chunk_end
+        hi = bisect.bisect_left(self.starts, chunk_end)
+        return [
+            item for item in self.lines[lo:hi]
+            if item["start"] + item["duration"] > chunk_start
+        ]
+
+def _to_ass_time(sec, chunk_start):
+    # Convert absolute time to chunk-relative
+    rel = sec - chunk_start
+    if rel < 0:
+        rel = 0
+    total_cs = int(round(rel * 100))
+    hours = total_cs // 360000
+    minutes = (total_cs % 360000) // 6000
+    seconds = (total_cs % 6000) // 100
+    centisec = total_cs % 100
+    return f"{hours:01d}:{minutes:02d}:{seconds:02d}.{centisec:02d}"
+
+def generate_ass_subtitles_for_chunk(subtitle_lines, chunk_start, chunk_end, output_ass_path, style="lines"):
+    """
+    Generate an .ass file with a custom style "TikTokFunky":
+      - Big, bold, centered in the middle of the screen
+      - We'll use \fad(500,500) on each line for a simple fade in/out
+
+    subtitle_lines may be a list of transcript lines or a TranscriptIndex.
+    Other styles from subtitle_utils.SUBTITLE_STYLES ("karaoke", "popon")
+    produce word-level subtitles instead.
+    """
+    if isinstance(subtitle_lines, TranscriptIndex):
+        subtitle_lines = subtitle_lines.slice(chunk_start, chunk_end)
+    if style != "lines":
+        write_word_subtitles(subtitle_lines, chunk_start, chunk_end, output_ass_path, style)
+        return
+
     dialogue_lines = []
     for item in subtitle_lines:
         abs_start = item["start"]
@@ -46,8 +96,8 @@ Format: Layer,Start,End,Style,Name,MarginL,MarginR,MarginV,Effect,Text
         if abs_start >= chunk_end or abs_end <= chunk_start:
             continue
 
-        start_ts = to_ass_time(abs_start)
-        end_ts = to_ass_time(abs_end)
+        start_ts = _to_ass_time(abs_start, chunk_start)
+        end_ts = _to_ass_time(abs_end, chunk_start)
         # Add a fade in/out with \fad(500,500) for 0.5s fade in/out
         text = item["text"].replace("\n", " ").replace(",", "，")
         text = "{\\fad(500,500)}" + text
@@ -57,7 +107,370 @@ Format: Layer,Start,End,Style,Name,MarginL,MarginR,MarginV,Effect,Text
         dialogue_lines.append(dialogue)
 
     with open(output_ass_path, "w", encoding="utf-8") as f:
-        f.write(ass_header + "\n".join(dialogue_lines))
+        f.write(ASS_HEADER + "\n".join(dialogue_lines))
+
+def generate_ass_subtitles_for_segments(transcript_data, segments, output_folder="topic_segments",
+                                        style="lines"):
+    """
+    Write the .ass file of every segment in one pass over a shared
+    TranscriptIndex. Returns the subtitle paths in segment order.
+    """
+    index = transcript_data if isinstance(transcript_data, TranscriptIndex) else TranscriptIndex(transcript_data)
+    if not os.path.exists(output_folder):
+        os.makedirs(output_folder)
+    paths = []
+    for i, seg in enumerate(segments, start=1):
+        out_ass = segment_paths(i, seg, output_folder)["ass"]
+        generate_ass_subtitles_for_chunk(index, seg["start"], seg["end"], out_ass, style)
+        paths.append(out_ass)
+    return paths
+
+def segment_paths(index, seg, output_folder="topic_segments"):
+    """Output paths for a segment: cut chunk, subtitles, vertical reel and its crop path"""
+    topic_label = seg["topic"] or f"segment_{index}"
+    safe_topic = "".join(c for c in topic_label if c.isalnum() or c in " _-").strip()
+    safe_topic = safe_topic[:50]  # Limit length
+    base = os.path.abspath(os.path.join(output_folder, f"{seg['start']:.2f}_{safe_topic}"))
+    return {
+        "chunk": base + ".mp4",
+        "ass": base + ".ass",
+        "centered": base + "_centered.mp4",
+        # Crop paths are kept out of sight, next to the reels
+        "crop": os.path.join(os.path.dirname(base), ".crop_paths", os.path.basename(base) + ".npz"),
+    }
+
+def partial_path(path):
+    """Where an output is written before it is moved into place (keeps the extension for ffmpeg)"""
+    root, ext = os.path.splitext(path)
+    return f"{root}.partial{ext}"
+
+def profile_output_folder(output_folder, encode_profile):
+    """Draft/preview renders go to their own subfolder so they never replace published reels"""
+    if encode_profile == "publish":
+        return output_folder
+    return os.path.join(output_folder, encode_profile)
+
+def render_segment(
+    index,
+    seg,
+    video_path,
+    transcript_data,
+    output_folder="topic_segments",
+    vertical=False,
+    model=None,
+    ffmpeg_threads=None,
+    cut_mode="seek",
+    subtitle_style="lines",
+    encode_profile="publish",
+    reuse=(),
+):
+    """
+    Cut one segment, write its subtitles and (optionally) render the
+    vertical reel. Returns a result dict describing what was produced.
+
+    With cut_mode "single" the chunk is expected to have been cut already
+    (see build_single_pass_cut_command) and only the rest is rendered.
+    Segments fetched as sections carry their own "source" file and the
+    "offset" of that file in the full video (see download_segment_sections).
+    Every output is written to its partial_path first and moved into place
+    once complete, so an interrupted render never leaves a truncated file.
+
+    `reuse` names the parts ("cut", "subtitles", "analysis", "reel", see
+    segment_manifest) whose existing outputs are still valid; those are not
+    produced again.
+    """
+    seg_start = seg["start"]
+    seg_end = seg["end"]
+    duration = seg_end - seg_start
+    source = seg.get("source", video_path)
+    source_start = seg_start - seg.get("offset", 0.0)
+    topic_label = seg["topic"] or f"segment_{index}"
+    result = {
+        "index": index,
+        "topic": topic_label,
+        "start": seg_start,
+        "end": seg_end,
+        "output": None,
+        "centered": None,
+        "ass": None,
+        "status": "skipped",
+        "error": None,
+        "metrics": None,
+    }
+    if duration <= 0:
+        return result
+    metrics = Metrics()
+
+    # Define output file paths
+    paths = segment_paths(index, seg, output_folder)
+    out_chunk = paths["chunk"]
+    out_ass = paths["ass"]
+
+    if vertical:
+        out_chunk_centered = paths["centered"]
+
+    try:
+        # Create subtitles for the segment
+        if "subtitles" not in reuse:
+            with metrics.stage("subtitles"):
+                generate_ass_subtitles_for_chunk(
+                    subtitle_lines=transcript_data,
+                    chunk_start=seg_start,
+                    chunk_end=seg_end,
+                    output_ass_path=partial_path(out_ass),
+                    style=subtitle_style,
+                )
+                os.replace(partial_path(out_ass), out_ass)
+        result["ass"] = out_ass
+
+        # create without cropping and subtitles
+        proc = None
+        if cut_mode != "single" and "cut" not in reuse:
+            cmd = build_cut_command(
+                source, source_start, duration, partial_path(out_chunk), cut_mode, ffmpeg_threads,
+                encode_profile, vertical)
+
+            print(f"[INFO] Running ffmpeg command for segment {index}:")
+            print(f"[INFO] Command: {' '.join(cmd)}")
+
+            # Execute FFmpeg to cut the video chunk
+            with metrics.stage("cut"):
+                proc = subprocess.run(
+                    cmd,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    text=True
+                )
+            if proc.returncode == 0 and os.path.exists(partial_path(out_chunk)):
+                os.replace(partial_path(out_chunk), out_chunk)
+
+        # Check if the output file was created successfully (and isn't left from an earlier run)
+        if (proc is not None and proc.returncode != 0) or not os.path.exists(out_chunk) \
+                or os.path.getsize(out_chunk) == 0:
+            print(f"[ERROR] Failed to create video segment {index}. FFmpeg output:")
+            print(proc.stderr if proc else "(cut in the single-pass command)")
+            result["status"] = "failed"
+            result["error"] = "ffmpeg did not produce the segment"
+            metrics.count("segments_failed")
+            result["metrics"] = metrics.to_dict()
+            return result
+
+        result["output"] = out_chunk
+        print(f"[INFO] Successfully created segment {index}: {out_chunk}")
+        print(f"      Topic: {topic_label}, Start={seg_start}, End={seg_end}")
+
+        # Properly escape the subtitle path for ffmpeg
+        escaped_ass = out_ass.replace("'", "'\\''")
+        # Frames reach ffmpeg already cropped to the profile's reel size, so only burn subtitles
+        filter_sub = f"subtitles='{escaped_ass}':force_style='FontName=Arial,FontSize=24'"
+
+        if vertical and "reel" not in reuse:
+            # torch, ultralytics and cv2 are only imported once a vertical reel is needed
+            from center_yolo import process_video_with_stabilization
+            process_video_with_stabilization(
+                out_chunk, partial_path(out_chunk_centered), filter_sub, 150,
+                model=model, ffmpeg_threads=ffmpeg_threads, metrics=metrics,
+                encode_profile=encode_profile, crop_path=paths["crop"],
+                reuse_crop_path="analysis" in reuse)
+            os.replace(partial_path(out_chunk_centered), out_chunk_centered)
+        if vertical:
+            result["centered"] = out_chunk_centered
+
+        result["status"] = "ok"
+
+    except subprocess.CalledProcessError as e:
+        print(f"[ERROR] FFmpeg command failed for segment {index}: {e}")
+        print(f"FFmpeg stderr output: {e.stderr}")
+        result["status"] = "failed"
+        result["error"] = str(e)
+    except Exception as e:
+        print(f"[ERROR] Failed to process segment {index}: {str(e)}")
+        result["status"] = "failed"
+        result["error"] = str(e)
+    metrics.count("segments_" + result["status"])
+    result["metrics"] = metrics.to_dict()
+    return result
+
+# Per-process state for pool workers, set up once by _init_render_worker
+_worker_model = None
+_worker_ffmpeg_threads = None
+
+def _init_render_worker(vertical, threads, load_model=True):
+    """Warm the worker's model pool once and cap the threads each worker may use"""
+    global _worker_model, _worker_ffmpeg_threads
+    _worker_ffmpeg_threads = threads
+    if vertical:
+        import cv2
+        import torch
+        cv2.setNumThreads(threads)
+        torch.set_num_threads(threads)
+        if load_model:
+            _worker_model = get_yolo_model()
+
+def _render_segment_in_worker(index, seg, video_path, transcript_data, output_folder, vertical,
+                              cut_mode, subtitle_style, encode_profile="publish", reuse=()):
+    return render_segment(
+        index, seg, video_path, transcript_data, output_folder, vertical,
+        model=_worker_model, ffmpeg_threads=_worker_ffmpeg_threads, cut_mode=cut_mode,
+        subtitle_style=subtitle_style, encode_profile=encode_profile, reuse=reuse)
+
+def cut_all_segments_single_pass(video_path, segments, output_folder, threads=None,
+                                 encode_profile="publish", indices=None, vertical=False):
+    """
+    Decode each source (the video, or its downloaded sections) once and write
+    every segment's chunk, or only those of the 1-based `indices` when given
+    (tall enough for the vertical reels when `vertical`).
+    Chunks are moved into place only if the pass succeeded; on failure any
+    chunk left from an earlier run is removed so it can't be mistaken for
+    the new one.
+    """
+    cuts_by_source = {}
+    for i, seg in enumerate(segments, start=1):
+        duration = seg["end"] - seg["start"]
+        if duration > 0 and (indices is None or i in indices):
+            cuts_by_source.setdefault(seg.get("source", video_path), []).append(
+                (seg["start"] - seg.get("offset", 0.0), duration,
+                 segment_paths(i, seg, output_folder)["chunk"]))
+    for source, cuts in cuts_by_source.items():
+        cmd = build_single_pass_cut_command(
+            source, [(start, duration, partial_path(path)) for start, duration, path in cuts],
+            threads, encode_profile, vertical)
+        print(f"[INFO] Cutting {len(cuts)} segments in a single ffmpeg pass.")
+        proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        if proc.returncode != 0:
+            print("[ERROR] Single-pass cut failed. FFmpeg output:")
+            print(proc.stderr)
+        for _, _, path in cuts:
+            if proc.returncode == 0 and os.path.exists(partial_path(path)):
+                os.replace(partial_path(path), path)
+            elif os.path.exists(path):
+                os.remove(path)
+
+def resolve_render_options(vertical, cut_mode=None, subtitle_style=None, encode_profile=None):
+    """
+    Validate the render options, filling in the configured defaults (CUT_MODE,
+    SUBTITLE_STYLE, ENCODE_PROFILE). Returns (cut_mode, subtitle_style,
+    encode_profile); "copy" becomes "seek" for vertical renders, see
+    resolve_cut_mode.
+    """
+    if cut_mode is None:
+        cut_mode = CUT_MODE
+    cut_mode = resolve_cut_mode(cut_mode, vertical)
+    if subtitle_style is None:
+        subtitle_style = SUBTITLE_STYLE
+    if subtitle_style not in SUBTITLE_STYLES:
+        raise ValueError(f"subtitle_style must be one of {SUBTITLE_STYLES}, got {subtitle_style!r}")
+    if encode_profile is None:
+        encode_profile = ENCODE_PROFILE
+    if encode_profile not in ENCODE_PROFILES:
+        raise ValueError(f"encode_profile must be one of {tuple(ENCODE_PROFILES)}, got {encode_profile!r}")
+    return cut_mode, subtitle_style, encode_profile
+
+def _completed(result):
+    """A future that already holds `result`, for rendering without a pool"""
+    future = Future()
+    future.set_result(result)
+    return future
+
+class RenderPlan:
+    """
+    Incremental render of every segment of one video into output_folder
+    (see cut_video_with_subtitles). The render jobs (index, seg, video_path,
+    lines, output_folder, vertical) are diffed against the folder's
+    manifest (see segment_manifest.py): segments that are entirely up to
+    date get a result with status "unchanged" right away; `jobs` are the
+    ones left to render, each with the parts it can reuse in `reuse`.
+    Outputs of segments that are gone are removed. Without `incremental`
+    everything is rendered again. Options must be resolved already (see
+    resolve_render_options).
+    """
+
+    def __init__(self, video_path, segments, transcript_data, output_folder, vertical,
+                 cut_mode, subtitle_style, encode_profile, incremental=True, metrics=None):
+        self.video_path = video_path
+        self.segments = segments
+        self.output_folder = output_folder
+        self.vertical = vertical
+        self.cut_mode = cut_mode
+        self.subtitle_style = subtitle_style
+        self.encode_profile = encode_profile
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.manifest = SegmentManifest(output_folder)
+        self.results = []
+        self.jobs = []
+        self.reuse = {}
+        self._inputs = {}
+        transcript_index = TranscriptIndex(transcript_data)
+        for index, seg in enumerate(segments, start=1):
+            lines = transcript_index.slice(seg["start"], seg["end"])
+            paths = segment_paths(index, seg, output_folder)
+            inputs, keys = segment_inputs(seg, lines, video_path, vertical, cut_mode,
+                                          subtitle_style, encode_profile)
+            self._inputs[index] = (paths, inputs, keys)
+            reuse = self.manifest.up_to_date(paths, keys) if incremental else set()
+            if reuse != set(keys):
+                self.jobs.append((index, seg, video_path, lines, output_folder, vertical))
+                self.reuse[index] = tuple(sorted(reuse))
+                continue
+            self.results.append({
+                "index": index,
+                "topic": seg["topic"] or f"segment_{index}",
+                "start": seg["start"],
+                "end": seg["end"],
+                "output": paths["chunk"],
+                "centered": paths["centered"] if vertical else None,
+                "ass": paths["ass"],
+                "status": "unchanged",
+                "error": None,
+                "metrics": None,
+            })
+        if self.results:
+            print(f"[CACHE] {len(self.results)} of {len(segments)} segments are unchanged since the last render.")
+        self.metrics.count("segments_unchanged", len(self.results))
+        self.manifest.prune([paths for paths, _, _ in self._inputs.values()])
+
+    @property
+    def cut_indices(self):
+        """Indices of the pending segments whose chunk must be cut again"""
+        return {job[0] for job in self.jobs if "cut" not in self.reuse[job[0]]}
+
+    @property
+    def needs_model(self):
+        """Whether a pending segment must run YOLO (its crop path can't be reused)"""
+        return any(job[5] and "analysis" not in self.reuse[job[0]] for job in self.jobs)
+
+    def finished(self, result, name=None):
+        """Collect a rendered segment's result, recording it in the manifest when it succeeded"""
+        print(f"[INFO] {name + ': ' if name else ''}Segment {result['index']} finished: {result['status']}")
+        if result["metrics"]:
+            self.metrics.merge(result["metrics"])
+        if result["status"] == "ok":
+            self.manifest.record(*self._inputs[result["index"]])
+        self.results.append(result)
+
+    def render(self, submit, name=None):
+        """
+        Render the pending segments and return every result, in segment
+        order. With cut_mode "single" the chunks to re-cut are cut in one
+        pass first. `submit(job, reuse)` starts rendering one job and
+        returns a concurrent.futures.Future of its render_segment result;
+        results are collected as they complete (`name` prefixes the log).
+        """
+        if self.cut_mode == "single" and self.cut_indices:
+            with self.metrics.stage("cut"):
+                cut_all_segments_single_pass(self.video_path, self.segments, self.output_folder,
+                                             encode_profile=self.encode_profile,
+                                             indices=self.cut_indices, vertical=self.vertical)
+        futures = []
+        for job in self.jobs:
+            future = submit(job, self.reuse[job[0]])
+            if future.done():
+                self.finished(future.result(), name)  # Rendered in place; record it right away
+            else:
+                futures.append(future)
+        for future in as_completed(futures):
+            self.finished(future.result(), name)
+        return sorted(self.results, key=lambda r: r["index"])
 
 def cut_video_with_subtitles(
     video_path,
@@ -65,96 +478,67 @@ def cut_video_with_subtitles(
     transcript_data,
     output_folder="topic_segments",
     vertical=False,
+    workers=None,
+    cut_mode=None,
+    subtitle_style=None,
+    metrics=None,
+    model=None,
+    encode_profile=None,
+    incremental=None,
 ):
+    """
+    Render every segment. With workers > 1 segments are rendered concurrently
+    in a process pool; each worker loads YOLO once and gets an equal share of
+    the CPU cores for ffmpeg/torch threads. Returns one result dict per
+    segment, in segment order.
+
+    cut_mode is one of ffmpeg_utils.CUT_MODES (default CUT_MODE; "copy"
+    becomes "seek" for vertical renders, see resolve_cut_mode) and
+    subtitle_style one of subtitle_utils.SUBTITLE_STYLES (default SUBTITLE_STYLE).
+    Per-segment stage timings are merged into `metrics` when given. An
+    already loaded YOLO `model` is reused by the sequential path.
+
+    encode_profile is one of ffmpeg_utils.ENCODE_PROFILES (default
+    ENCODE_PROFILE). "draft" and "preview" render small, fast reels for
+    review into a subfolder of output_folder named after the profile.
+
+    With incremental (default INCREMENTAL_RENDER) segments whose inputs
+    match the folder's manifest (see segment_manifest.py) are not rendered
+    again; they are reported with status "unchanged". Outputs of segments
+    that are gone are removed.
+    """
+    if metrics is None:
+        metrics = Metrics()
+    cut_mode, subtitle_style, encode_profile = resolve_render_options(
+        vertical, cut_mode, subtitle_style, encode_profile)
+    output_folder = profile_output_folder(output_folder, encode_profile)
     # Ensure the output folder exists
     if not os.path.exists(output_folder):
         os.makedirs(output_folder)
 
-    for i, seg in enumerate(segments, start=1):
-        seg_start = seg["start"]
-        seg_end = seg["end"]
-        duration = seg_end - seg_start
-        if duration <= 0:
-            continue
+    if workers is None:
+        workers = RENDER_WORKERS
+    if incremental is None:
+        incremental = INCREMENTAL_RENDER
 
-        topic_label = seg["topic"] or f"segment_{i}"
-        safe_topic = "".join(c for c in topic_label if c.isalnum() or c in " _-").strip()
-        safe_topic = safe_topic[:50]  # Limit length
-        
-        # Define output file paths
-        out_chunk = os.path.abspath(os.path.join(
-            output_folder, f"{seg_start:.2f}_{safe_topic}.mp4"))
-        out_ass = os.path.abspath(os.path.join(
-            output_folder, f"{seg_start:.2f}_{safe_topic}.ass"))
-        
-        if vertical:
-            out_chunk_centered = os.path.abspath(os.path.join(
-                output_folder, f"{seg_start:.2f}_{safe_topic}_centered.mp4"))
-            out_ass_centered = os.path.abspath(os.path.join(
-                output_folder, f"{seg_start:.2f}_{safe_topic}_centered.ass"))
-
-        try:
-            # Create subtitles for the segment
-            generate_ass_subtitles_for_chunk(
-                subtitle_lines=transcript_data,
-                chunk_start=seg_start,
-                chunk_end=seg_end,
-                output_ass_path=out_ass,
-            )
-
-            # create without cropping and subtitles 
-            cmd = [
-                "ffmpeg",
-                "-y",
-                "-i", video_path,
-                "-ss", str(seg_start),
-                "-t", str(duration),
-                "-c:v", "libx264",
-                "-preset", "fast",
-                "-crf", "23",
-                "-c:a", "aac",
-                "-b:a", "128k",
-                "-movflags", "+faststart",
-                out_chunk
-            ]
-
-            print(f"[INFO] Running ffmpeg command for segment {i}:")
-            print(f"[INFO] Command: {' '.join(cmd)}")
-            
-            # Execute FFmpeg to cut the video chunk
-            result = subprocess.run(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-            )
-
-            # Check if the output file was created successfully
-            if not os.path.exists(out_chunk) or os.path.getsize(out_chunk) == 0:
-                print(f"[ERROR] Failed to create video segment {i}. FFmpeg output:")
-                print(result.stderr)
-                continue
+    plan = RenderPlan(video_path, segments, transcript_data, output_folder, vertical,
+                      cut_mode, subtitle_style, encode_profile, incremental, metrics)
+    workers = max(1, min(workers, len(plan.jobs)))
 
-            print(f"[INFO] Successfully created segment {i}: {out_chunk}")
-            print(f"      Topic: {topic_label}, Start={seg_start}, End={seg_end}")
-
-            # Properly escape the subtitle path for ffmpeg
-            escaped_ass = out_ass.replace("'", "'\\''")
-            # Build filter string for vertical/horizontal video
-           
-            filter_sub = (
-                f"scale=-1:1920:force_original_aspect_ratio=increase,"
-                f"crop=1080:1920:(in_w-1080)/2:(in_h-1920)/2,"
-                f"subtitles='{escaped_ass}':force_style='FontName=Arial,FontSize=24'"
-            )
-
-            if vertical:
-                process_video_with_stabilization(out_chunk, out_chunk_centered, filter_sub, 150)
-
-        except subprocess.CalledProcessError as e:
-            print(f"[ERROR] FFmpeg command failed for segment {i}: {e}")
-            print(f"FFmpeg stderr output: {e.stderr}")
-            continue
-        except Exception as e:
-            print(f"[ERROR] Failed to process segment {i}: {str(e)}")
-            continue 
\ No newline at end of file
+    if workers == 1:
+        if model is None and vertical and plan.needs_model:
+            with metrics.stage("model_load"):
+                model = get_yolo_model()
+        return plan.render(lambda job, reuse: _completed(render_segment(
+            *job, model=model, cut_mode=cut_mode, subtitle_style=subtitle_style,
+            encode_profile=encode_profile, reuse=reuse)))
+
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    print(f"[INFO] Rendering {len(plan.jobs)} segments with {workers} workers ({threads} threads each).")
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_render_worker,
+        initargs=(vertical, threads, plan.needs_model),
+    ) as pool:
+        return plan.render(lambda job, reuse: pool.submit(
+            _render_segment_in_worker, *job, cut_mode, subtitle_style, encode_profile, reuse))
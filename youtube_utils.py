@@ -1,8 +1,12 @@
+import bisect
 import subprocess
 import os
 import re
 from youtube_transcript_api import YouTubeTranscriptApi, NoTranscriptFound
 
+from ffmpeg_utils import build_cut_command
+from config import SECTION_PADDING, SECTION_MERGE_GAP
+
 def download_youtube_video(url, output_path="downloaded_video.mp4"):
     """
     Downloads the best available YouTube video via yt-dlp.
@@ -20,6 +24,99 @@ def download_youtube_video(url, output_path="downloaded_video.mp4"):
         print(f"[ERROR] Download failed: {e}")
         return None
 
+# How the video is fetched:
+#   full     - download the whole video while the transcript is segmented
+#   sections - segment first, then fetch only the segments' time ranges
+DOWNLOAD_MODES = ("full", "sections")
+
+def plan_download_ranges(segments, padding=SECTION_PADDING, merge_gap=SECTION_MERGE_GAP):
+    """
+    Time ranges to fetch so every segment is covered with `padding` seconds
+    on each side. Ranges closer than `merge_gap` are fetched as one.
+    Returns a sorted list of (start, end).
+    """
+    ranges = []
+    for seg in sorted(segments, key=lambda s: s["start"]):
+        if seg["end"] <= seg["start"]:
+            continue
+        start = max(0.0, seg["start"] - padding)
+        end = seg["end"] + padding
+        if ranges and start - ranges[-1][1] <= merge_gap:
+            ranges[-1] = (ranges[-1][0], max(ranges[-1][1], end))
+        else:
+            ranges.append((start, end))
+    return ranges
+
+def download_youtube_sections(url, ranges, output_dir):
+    """
+    Downloads only the given (start, end) ranges via yt-dlp --download-sections,
+    one file per range. Returns the file paths, or None if any range failed.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    paths = []
+    for i, (start, end) in enumerate(ranges, start=1):
+        output_path = os.path.join(output_dir, f"section_{i}.mp4")
+        command = [
+            "yt-dlp",
+            "-f", "best",
+            "--download-sections", f"*{start:.3f}-{end:.3f}",
+            "--force-keyframes-at-cuts",  # Sections start exactly at `start`
+            "--output", output_path,
+            url
+        ]
+        try:
+            subprocess.run(command, check=True)
+        except subprocess.CalledProcessError as e:
+            print(f"[ERROR] Section download failed: {e}")
+            return None
+        paths.append(os.path.abspath(output_path))
+    return paths
+
+def extract_local_sections(video_path, ranges, output_dir):
+    """
+    Local stand-in for download_youtube_sections: cuts the same ranges out
+    of an already available file, so the section flow works offline.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    paths = []
+    for i, (start, end) in enumerate(ranges, start=1):
+        output_path = os.path.join(output_dir, f"section_{i}.mp4")
+        proc = subprocess.run(build_cut_command(video_path, start, end - start, output_path),
+                              stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        if proc.returncode != 0:
+            print(f"[ERROR] Section extraction failed: {proc.stderr}")
+            return None
+        paths.append(os.path.abspath(output_path))
+    return paths
+
+def download_segment_sections(source, segments, output_dir, padding=SECTION_PADDING):
+    """
+    Fetch only the parts of `source` (a YouTube URL, or a local file for
+    offline runs) that the segments need. Returns copies of the segments
+    with "source" (the section file) and "offset" (where that section
+    starts in the full video), or None if fetching failed.
+    """
+    ranges = plan_download_ranges(segments, padding)
+    if os.path.exists(source):
+        paths = extract_local_sections(source, ranges, output_dir)
+    else:
+        paths = download_youtube_sections(source, ranges, output_dir)
+    if paths is None:
+        return None
+    print(f"[INFO] Fetched {len(ranges)} sections, {sum(e - s for s, e in ranges):.0f}s in total.")
+
+    starts = [start for start, _ in ranges]
+    located = []
+    for seg in segments:
+        seg = dict(seg)
+        if seg["end"] > seg["start"]:
+            # Last range starting at or before the segment; ranges are sorted and disjoint
+            i = bisect.bisect_right(starts, seg["start"]) - 1
+            seg["source"] = paths[i]
+            seg["offset"] = ranges[i][0]
+        located.append(seg)
+    return located
+
 def fetch_youtube_transcript(video_id, language_code='en'):
     """
     Attempts to retrieve the official transcript from YouTube.
@@ -35,15 +132,21 @@ def fetch_youtube_transcript(video_id, language_code='en'):
         print(f"[ERROR] fetch_youtube_transcript: {e}")
         return None
 
-def get_transcript(url):
+def extract_video_id(url):
     """
-    1) Extract video ID
-    2) Attempt official transcript
+    Extract the video ID from a YouTube watch URL.
     """
     match = re.search(r"v=([^&]+)", url)
     if not match:
         raise ValueError("Couldn't extract video_id from URL.")
-    video_id = match.group(1)
+    return match.group(1)
+
+def get_transcript(url):
+    """
+    1) Extract video ID
+    2) Attempt official transcript
+    """
+    video_id = extract_video_id(url)
 
     data = fetch_youtube_transcript(video_id)
     if data: